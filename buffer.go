@@ -0,0 +1,123 @@
+package pygo
+
+// #include <stdlib.h>
+import "C"
+
+import (
+	"fmt"
+	"unsafe"
+)
+
+// Buffer describes a strided array in memory outside the Go heap, shared between Python and Go
+// without copying. Python passes an ndarray as a Buffer by wrapping it in gobcodec.GoBuffer; the
+// memory belongs to the caller and is valid only until the registered function returns, so Go
+// code must not retain slices into it (or write to it, if the array is read-only).
+//
+// Registered functions can also return a Buffer allocated with NewFloat64Buffer, etc. Python then
+// wraps the memory as an ndarray, without copying, and frees it when the ndarray is garbage
+// collected. Such Buffers must be returned directly (not nested in another value); otherwise, they
+// must be released with Free.
+type Buffer = PygoBuffer
+
+// PygoBuffer is Buffer's defined type. encoding/gob sends struct types by name, and Python
+// recognizes Buffers by it, so the name must not be one that user types are likely to have.
+type PygoBuffer struct {
+	// Ptr is the address of the first element.
+	Ptr int
+	// DType is the NumPy array-protocol type string, for example "<f8".
+	DType string
+	// Shape and Strides (in bytes) are as in NumPy.
+	Shape, Strides []int
+}
+
+const (
+	dtypeFloat64 = "<f8"
+	dtypeInt64   = "<i8"
+)
+
+// Len returns the number of elements in b.
+func (b Buffer) Len() int {
+	n := 1
+	for _, dim := range b.Shape {
+		n *= dim
+	}
+	return n
+}
+
+// Float64s returns a slice aliasing b, which must be a C-contiguous array of float64.
+func (b Buffer) Float64s() []float64 {
+	b.mustBe(dtypeFloat64, 8)
+	if b.Ptr == 0 {
+		return nil
+	}
+	return unsafe.Slice((*float64)(b.pointer()), b.Len())
+}
+
+// Int64s returns a slice aliasing b, which must be a C-contiguous array of int64.
+func (b Buffer) Int64s() []int64 {
+	b.mustBe(dtypeInt64, 8)
+	if b.Ptr == 0 {
+		return nil
+	}
+	return unsafe.Slice((*int64)(b.pointer()), b.Len())
+}
+
+// NewFloat64Buffer allocates a C-contiguous float64 Buffer with the given shape, and returns it
+// along with a slice aliasing its (zeroed) memory.
+func NewFloat64Buffer(shape ...int) (Buffer, []float64) {
+	b := newBuffer(dtypeFloat64, 8, shape)
+	return b, b.Float64s()
+}
+
+// NewInt64Buffer is like NewFloat64Buffer, for int64.
+func NewInt64Buffer(shape ...int) (Buffer, []int64) {
+	b := newBuffer(dtypeInt64, 8, shape)
+	return b, b.Int64s()
+}
+
+// Free releases memory allocated by NewFloat64Buffer, etc. It must not be called for Buffers
+// returned to Python, or received from Python.
+func (b Buffer) Free() {
+	C.free(b.pointer())
+}
+
+func newBuffer(dtype string, itemSize int, shape []int) Buffer {
+	b := Buffer{DType: dtype, Shape: append([]int{}, shape...), Strides: make([]int, len(shape))}
+	stride := itemSize
+	for i := len(shape) - 1; i >= 0; i-- {
+		if shape[i] < 0 {
+			panic(fmt.Sprintf("pygo: negative dimension in shape %v", shape))
+		}
+		b.Strides[i] = stride
+		stride *= shape[i]
+	}
+	// Always allocate at least one byte so Ptr is non-nil and unique.
+	b.Ptr = int(uintptr(C.calloc(C.size_t(b.Len()+1), C.size_t(itemSize))))
+	return b
+}
+
+func (b Buffer) mustBe(dtype string, itemSize int) {
+	if b.DType != dtype {
+		panic(fmt.Sprintf("pygo: Buffer has dtype %q, want %q", b.DType, dtype))
+	}
+	stride := itemSize
+	for i := len(b.Shape) - 1; i >= 0; i-- {
+		if b.Shape[i] > 1 && b.Strides[i] != stride {
+			panic(fmt.Sprintf("pygo: Buffer is not C-contiguous: shape %v, strides %v", b.Shape, b.Strides))
+		}
+		stride *= b.Shape[i]
+	}
+}
+
+// pointer converts Ptr, which refers to memory not managed by the Go runtime. Ptr stays an int
+// so Buffer can be gob-encoded; offsetting nil converts it without a uintptr intermediate.
+func (b Buffer) pointer() unsafe.Pointer {
+	return unsafe.Add(nil, b.Ptr)
+}
+
+// grail_pygo_buffer_free frees a Buffer returned to Python.
+//
+//export grail_pygo_buffer_free
+func grail_pygo_buffer_free(ptr unsafe.Pointer) {
+	C.free(ptr)
+}
@@ -0,0 +1,129 @@
+package pygo
+
+// #include "pygo.h"
+import "C"
+
+import (
+	"bytes"
+	"encoding/gob"
+	"fmt"
+	"reflect"
+	"unsafe"
+)
+
+// feedRef is what Python sends in place of an iterator argument. Feed identifies the iterator
+// in calls to grail_pygo_request.pull.
+type feedRef struct {
+	Feed int
+}
+
+// feed delivers items from a Python iterator to a function parameter of type <-chan T (or
+// chan T), or func() (T, bool), which returns false after the last item.
+//
+// A goroutine pulls a batch from Python (via a callback, which takes the GIL) only once the
+// previous one fits in ch's buffer, so memory stays bounded and Python can't get far ahead of Go.
+type feed struct {
+	ref    feedRef
+	pull   C.grail_pygo_pull_fn
+	ch     reflect.Value // Closed after the last item.
+	buf    bytes.Buffer
+	dec    *gob.Decoder
+	errMsg string        // Set before exited is closed.
+	done   chan struct{} // Closed when the function returns.
+	exited chan struct{}
+}
+
+// feedElem returns the item type of a parameter of type t, if it can be fed.
+func feedElem(t reflect.Type) (elem reflect.Type, ok bool) {
+	switch {
+	case t.Kind() == reflect.Chan && t.ChanDir()&reflect.RecvDir != 0:
+		return t.Elem(), true
+	case t.Kind() == reflect.Func && t.NumIn() == 0 && t.NumOut() == 2 &&
+		t.Out(1).Kind() == reflect.Bool:
+		return t.Out(0), true
+	}
+	return nil, false
+}
+
+// startFeed starts pulling ref's items, returning the argument to pass for parameter type t.
+func startFeed(ref feedRef, pull C.grail_pygo_pull_fn, t reflect.Type) (*feed, reflect.Value) {
+	elem, _ := feedElem(t)
+	f := &feed{
+		ref:    ref,
+		pull:   pull,
+		ch:     reflect.MakeChan(reflect.ChanOf(reflect.BothDir, elem), streamBuffer),
+		done:   make(chan struct{}),
+		exited: make(chan struct{}),
+	}
+	f.dec = gob.NewDecoder(&f.buf)
+	go f.run(reflect.SliceOf(elem))
+
+	if t.Kind() == reflect.Chan {
+		return f, f.ch.Convert(t)
+	}
+	zero := reflect.Zero(elem)
+	return f, reflect.MakeFunc(t, func([]reflect.Value) []reflect.Value {
+		item, ok := f.ch.Recv()
+		if !ok {
+			item = zero
+		}
+		return []reflect.Value{item, reflect.ValueOf(ok)}
+	})
+}
+
+func (f *feed) run(batchType reflect.Type) {
+	defer close(f.exited)
+	defer f.ch.Close()
+	doneCase := reflect.SelectCase{Dir: reflect.SelectRecv, Chan: reflect.ValueOf(f.done)}
+	for {
+		select {
+		case <-f.done:
+			return
+		default:
+		}
+		var batch C.struct_grail_pygo_tuple
+		if C.grail_pygo_pull(f.pull, C.ulonglong(f.ref.Feed), &batch) != 0 {
+			// Python raises the iterator's exception after the call.
+			f.errMsg = fmt.Sprintf("pygo: feed %d: error in Python iterator", f.ref.Feed)
+			return
+		}
+		if batch.num == 0 {
+			return
+		}
+		f.buf.Reset()
+		f.buf.Write(unsafe.Slice((*byte)(unsafe.Pointer(batch.data)), batch.data_size))
+		items := reflect.New(batchType)
+		if err := f.dec.DecodeValue(items); err != nil {
+			f.errMsg = fmt.Sprintf("pygo: feed %d: error decoding items: %v", f.ref.Feed, err)
+			return
+		}
+		items = items.Elem()
+		for i := 0; i < items.Len(); i++ {
+			item := items.Index(i)
+			if f.ch.TrySend(item) {
+				continue
+			}
+			cases := []reflect.SelectCase{{Dir: reflect.SelectSend, Chan: f.ch, Send: item}, doneCase}
+			if chosen, _, _ := reflect.Select(cases); chosen != 0 {
+				return
+			}
+		}
+	}
+}
+
+type feeds []*feed
+
+// stop stops pulling items, once the function has returned, and returns the first error. Python
+// objects backing the feeds may be released after stop returns.
+func (fs feeds) stop() (errMsg string) {
+	for _, f := range fs {
+		close(f.done)
+	}
+	for _, f := range fs {
+		<-f.exited
+		if errMsg == "" {
+			errMsg = f.errMsg
+		}
+	}
+	return errMsg
+}
@@ -0,0 +1,77 @@
+package pygo
+
+// #include "pygo.h"
+import "C"
+
+import (
+	"time"
+	"unsafe"
+)
+
+// goRequest makes grail_pygo_requests from Go, the way Python does, for tests and benchmarks of
+// the entry points (which can't use cgo themselves).
+type goRequest struct {
+	req    *C.struct_grail_pygo_request
+	insCap int // Of req.ins.data.
+}
+
+// newGoRequest returns a request for funcName, in a new session if session is true. Callers must
+// call free.
+func newGoRequest(funcName string, session bool) *goRequest {
+	r := &goRequest{req: (*C.struct_grail_pygo_request)(C.calloc(1, C.sizeof_struct_grail_pygo_request))}
+	r.req.func_name = C.CString(funcName)
+	if session {
+		r.req.session = grail_pygo_session_new()
+	}
+	return r
+}
+
+// call calls grail_pygo_call with num arguments, gob-encoded in ins, and returns the encoded
+// results.
+func (r *goRequest) call(num int, ins []byte) (outs []byte, errMsg string) {
+	if r.insCap < len(ins) {
+		C.free(unsafe.Pointer(r.req.ins.data))
+		r.req.ins.data = (*C.uchar)(C.malloc(C.size_t(len(ins))))
+		r.insCap = len(ins)
+	}
+	copy(unsafe.Slice((*byte)(unsafe.Pointer(r.req.ins.data)), len(ins)), ins)
+	r.req.ins.num = C.int(num)
+	r.req.ins.data_size = C.size_t(len(ins))
+	if err := grail_pygo_call(r.req); err != nil {
+		errMsg = C.GoString(err)
+		C.free(unsafe.Pointer(err))
+		return nil, errMsg
+	}
+	outs = C.GoBytes(unsafe.Pointer(r.req.outs.data), C.int(r.req.outs.data_size))
+	grail_pygo_free(r.req)
+	return outs, ""
+}
+
+// setTimed sets whether calls record the durations of their phases, for timing.
+func (r *goRequest) setTimed(timed bool) {
+	r.req.timed = 0
+	if timed {
+		r.req.timed = 1
+	}
+}
+
+// timing returns the phases of the last timed call: decode, call, encode, copy, and total.
+func (r *goRequest) timing() [5]time.Duration {
+	t := r.req.timing
+	return [5]time.Duration{
+		time.Duration(t.decode_ns),
+		time.Duration(t.call_ns),
+		time.Duration(t.encode_ns),
+		time.Duration(t.copy_ns),
+		time.Duration(t.total_ns),
+	}
+}
+
+func (r *goRequest) free() {
+	if r.req.session != 0 {
+		grail_pygo_session_free(r.req.session)
+	}
+	C.free(unsafe.Pointer(r.req.func_name))
+	C.free(unsafe.Pointer(r.req.ins.data))
+	C.free(unsafe.Pointer(r.req))
+}
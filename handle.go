@@ -0,0 +1,51 @@
+package pygo
+
+import "C"
+
+import "fmt"
+
+// Handle refers to a Go value that stays in the Go heap, so Python can hold on to it (and pass
+// it back to registered functions) without the value being encoded each time:
+//
+//	pygo.Register("index_build", func(path string) pygo.Handle {
+//		return pygo.NewHandle(buildIndex(path))
+//	})
+//	pygo.Register("index_query", func(h pygo.Handle, q string) []string {
+//		return h.Value().(*index).query(q)
+//	})
+//
+// Python releases the value when its handle is closed or garbage collected. Go code must not use
+// a Handle after that (Value panics).
+type Handle = PygoHandle
+
+// PygoHandle is Handle's defined type. encoding/gob sends struct types by name, and Python
+// recognizes Handles by it, so a user type named Handle doesn't decode as one (and release an
+// unrelated value when it's collected).
+type PygoHandle struct {
+	// ID identifies the value. 0 is never valid.
+	ID int
+}
+
+var handles table
+
+// NewHandle returns a new Handle for v.
+func NewHandle(v interface{}) Handle {
+	return Handle{int(handles.add(v))}
+}
+
+// Value returns h's value. It panics if h was released.
+func (h Handle) Value() interface{} {
+	v := handles.get(uint64(h.ID))
+	if v == nil {
+		panic(fmt.Sprintf("pygo: handle %d not found (released?)", h.ID))
+	}
+	return v
+}
+
+// grail_pygo_handle_release releases handle id's value. It does nothing if id was already
+// released.
+//
+//export grail_pygo_handle_release
+func grail_pygo_handle_release(id C.longlong) {
+	handles.remove(uint64(id))
+}
@@ -1,19 +1,6 @@
 package pygo
 
-/*
-#include <stdlib.h>
-struct grail_pygo_tuple {
-	int num;
-	size_t data_size;
-	unsigned char *data;
-};
-
-struct grail_pygo_request {
-	char *func_name;
-	struct grail_pygo_tuple ins;
-	struct grail_pygo_tuple outs;
-};
-*/
+// #include "pygo.h"
 import "C"
 
 import (
@@ -21,73 +8,274 @@ import (
 	"encoding/gob"
 	"fmt"
 	"reflect"
+	"runtime"
 	"runtime/debug"
+	"sync"
+	"sync/atomic"
 	"unsafe"
 )
 
 //export grail_pygo_call
 func grail_pygo_call(req *C.struct_grail_pygo_request) (err *C.char) {
 	req.outs = C.struct_grail_pygo_tuple{}
+	t := startTimer(req)
+	defer t.end()
+
+	c, errMsg := startCall(req)
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	defer c.done()
+
+	ins, feeds, errMsg := c.decodeIns()
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	t.lap(phaseDecode)
+	outs, errMsg := c.invoke(ins)
+	if feedErrMsg := feeds.stop(); errMsg == "" {
+		errMsg = feedErrMsg
+	}
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	t.lap(phaseCall)
+	for i, out := range outs {
+		if err := c.outsEnc.EncodeValue(out); err != nil {
+			return C.CString(fmt.Sprintf("pygo: error encoding return %d: %v", i, err))
+		}
+	}
+	t.lap(phaseEncode)
+	c.setOuts(req, len(outs))
+	t.lap(phaseCopy)
+	return nil
+}
+
+// grail_pygo_call_many calls req.func_name once for each of calls argument lists. req.ins has
+// one slice per parameter, each of length calls; element k of each is an argument of the k-th
+// call. Calls run concurrently. Results are encoded similarly: first a map[int]string of errors
+// from failed calls, by index, then one slice per result, with zero values for failed calls.
+// Columns let both sides use their (vectorized) slice codecs rather than a value per call.
+//
+// A returned error means the whole batch failed (for example, undecodable arguments).
+//
+//export grail_pygo_call_many
+func grail_pygo_call_many(req *C.struct_grail_pygo_request, calls C.int) (err *C.char) {
+	req.outs = C.struct_grail_pygo_tuple{}
+	t := startTimer(req)
+	defer t.end()
+
+	c, errMsg := startCall(req)
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	defer c.done()
 
 	var (
-		funcName  = C.GoString(req.func_name)
-		funcValue = findFunc(funcName)
+		n        = int(calls)
+		argLists = make([][]reflect.Value, n)
+		outLists = make([][]reflect.Value, n)
+		errMsgs  = make([]string, n)
 	)
-	if !funcValue.IsValid() {
-		return C.CString(fmt.Sprintf("pygo: function %q not found (did you pygo.Register?)", funcName))
+	for k := range argLists {
+		argLists[k] = make([]reflect.Value, c.funcType.NumIn())
 	}
-
-	// TODO: Allow variadic?
-	funcType := funcValue.Type()
-	if got, want := int(req.ins.num), funcType.NumIn(); got != want {
-		return C.CString(fmt.Sprintf("pygo: wrong number of arguments: got %d, want %d", got, want))
+	for i := 0; i < c.funcType.NumIn(); i++ {
+		col := reflect.New(reflect.SliceOf(c.funcType.In(i)))
+		if err := c.insDec.DecodeValue(col); err != nil {
+			return C.CString(fmt.Sprintf("pygo: error decoding argument %d: %v", i, err))
+		}
+		col = col.Elem()
+		if col.Len() != n {
+			return C.CString(fmt.Sprintf("pygo: argument %d: got %d values, want %d", i, col.Len(), n))
+		}
+		for k := range argLists {
+			argLists[k][i] = col.Index(k)
+		}
 	}
+	t.lap(phaseDecode)
+
+	// Calls are typically small, so workers claim them in chunks to limit contention.
 	var (
-		insBytes = C.GoBytes(unsafe.Pointer(req.ins.data), C.int(req.ins.data_size))
-		insDec   = gob.NewDecoder(bytes.NewReader(insBytes))
-		ins      = make([]reflect.Value, req.ins.num)
+		next    atomic.Int64
+		wg      sync.WaitGroup
+		workers = runtime.GOMAXPROCS(0)
+		chunk   = int64(n/(8*workers) + 1)
 	)
+	if workers > n {
+		workers = n
+	}
+	for w := 0; w < workers; w++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for {
+				end := next.Add(chunk)
+				start := end - chunk
+				if start >= int64(n) {
+					return
+				}
+				if end > int64(n) {
+					end = int64(n)
+				}
+				for k := start; k < end; k++ {
+					outLists[k], errMsgs[k] = c.invoke(argLists[k])
+				}
+			}
+		}()
+	}
+	wg.Wait()
+	t.lap(phaseCall)
+
+	cols := make([]reflect.Value, c.funcType.NumOut())
+	for j := range cols {
+		// gob doesn't distinguish pointers on the wire, but can't encode nil ones.
+		elemType := c.funcType.Out(j)
+		for elemType.Kind() == reflect.Ptr {
+			elemType = elemType.Elem()
+		}
+		cols[j] = reflect.MakeSlice(reflect.SliceOf(elemType), n, n)
+	}
+	for k, outs := range outLists {
+		if errMsgs[k] != "" {
+			continue
+		}
+		for j, out := range outs {
+			for out.Kind() == reflect.Ptr && !out.IsNil() {
+				out = out.Elem()
+			}
+			if out.Kind() == reflect.Ptr {
+				errMsgs[k] = fmt.Sprintf("pygo: error encoding return %d: nil pointer", j)
+				break
+			}
+			cols[j].Index(k).Set(out)
+		}
+	}
+	errs := map[int]string{}
+	for k, errMsg := range errMsgs {
+		if errMsg != "" {
+			errs[k] = errMsg
+		}
+	}
+	if err := c.outsEnc.Encode(errs); err != nil {
+		return C.CString(fmt.Sprintf("pygo: error encoding call errors: %v", err))
+	}
+	for j, col := range cols {
+		if err := c.outsEnc.EncodeValue(col); err != nil {
+			return C.CString(fmt.Sprintf("pygo: error encoding return %d: %v", j, err))
+		}
+	}
+	t.lap(phaseEncode)
+	c.setOuts(req, len(cols))
+	t.lap(phaseCopy)
+	return nil
+}
+
+// call holds the state shared by the entry points above, for one request.
+type call struct {
+	funcValue reflect.Value
+	funcType  reflect.Type
+	insDec    *gob.Decoder
+	pull      C.grail_pygo_pull_fn
+	outsBuf   *bytes.Buffer
+	outsEnc   *gob.Encoder
+	done      func()
+}
+
+// startCall looks up req's function and sets up gob streams. If errMsg is empty, callers must
+// call c.done when finished.
+func startCall(req *C.struct_grail_pygo_request) (c call, errMsg string) {
+	funcName := C.GoString(req.func_name)
+	c.funcValue = findFunc(funcName)
+	if !c.funcValue.IsValid() {
+		return c, fmt.Sprintf("pygo: function %q not found (did you pygo.Register?)", funcName)
+	}
+
+	// TODO: Allow variadic?
+	c.funcType = c.funcValue.Type()
+	c.pull = req.pull
+	if got, want := int(req.ins.num), c.funcType.NumIn(); got != want {
+		return c, fmt.Sprintf("pygo: wrong number of arguments: got %d, want %d", got, want)
+	}
+	if req.session == 0 {
+		insBytes := C.GoBytes(unsafe.Pointer(req.ins.data), C.int(req.ins.data_size))
+		c.insDec = gob.NewDecoder(bytes.NewReader(insBytes))
+		c.outsBuf = new(bytes.Buffer)
+		c.outsEnc = gob.NewEncoder(c.outsBuf)
+		c.done = func() {}
+		return c, ""
+	}
+	s, _ := sessions.get(uint64(req.session)).(*session)
+	if s == nil {
+		return c, fmt.Sprintf("pygo: session %d not found", req.session)
+	}
+	s.mu.Lock()
+	s.ins.Reset()
+	s.ins.Write(unsafe.Slice((*byte)(unsafe.Pointer(req.ins.data)), req.ins.data_size))
+	s.outs.Reset()
+	c.insDec, c.outsBuf, c.outsEnc = s.insDec, &s.outs, s.outsEnc
+	c.done = s.mu.Unlock
+	return c, ""
+}
+
+// decodeIns decodes one call's arguments. If errMsg is empty, callers must stop the returned
+// feeds after calling the function.
+func (c call) decodeIns() (ins []reflect.Value, fs feeds, errMsg string) {
+	ins = make([]reflect.Value, c.funcType.NumIn())
 	for i := range ins {
-		ins[i] = reflect.New(funcType.In(i))
-		if err := insDec.DecodeValue(ins[i]); err != nil {
-			return C.CString(fmt.Sprintf("pygo: error decoding argument %d: %v", i, err))
+		t := c.funcType.In(i)
+		if _, ok := feedElem(t); ok {
+			var ref feedRef
+			if err := c.insDec.Decode(&ref); err != nil {
+				fs.stop()
+				return nil, nil, fmt.Sprintf("pygo: error decoding argument %d (pass an iterator): %v", i, err)
+			}
+			if c.pull == nil {
+				fs.stop()
+				return nil, nil, fmt.Sprintf("pygo: argument %d: no pull function for feed", i)
+			}
+			var f *feed
+			f, ins[i] = startFeed(ref, c.pull, t)
+			fs = append(fs, f)
+			continue
+		}
+		ins[i] = reflect.New(t)
+		if err := c.insDec.DecodeValue(ins[i]); err != nil {
+			fs.stop()
+			return nil, nil, fmt.Sprintf("pygo: error decoding argument %d: %v", i, err)
 		}
 		ins[i] = ins[i].Elem()
 	}
+	return ins, fs, ""
+}
 
+// invoke calls the function, converting panics to errMsg.
+func (c call) invoke(ins []reflect.Value) (outs []reflect.Value, errMsg string) {
 	var (
-		outs         []reflect.Value
 		recovered    interface{}
 		recoverStack []byte
 	)
 	func() {
 		defer func() {
-			recovered = recover()
-			recoverStack = debug.Stack()
+			if recovered = recover(); recovered != nil {
+				recoverStack = debug.Stack()
+			}
 		}()
-		outs = funcValue.Call(ins)
+		outs = c.funcValue.Call(ins)
 	}()
 	if recovered != nil {
-		return C.CString(fmt.Sprintf("pygo: panic during call: %v:\n%s", recovered, recoverStack))
+		return nil, fmt.Sprintf("pygo: panic during call: %v:\n%s", recovered, recoverStack)
 	}
+	return outs, ""
+}
 
-	var (
-		outsBuf bytes.Buffer
-		outsEnc = gob.NewEncoder(&outsBuf)
-	)
-	for i, out := range outs {
-		if err := outsEnc.EncodeValue(out); err != nil {
-			return C.CString(fmt.Sprintf("pygo: error encoding return %d: %v", i, err))
-		}
-	}
-	req.outs.num = C.int(len(outs))
-	req.outs.data_size = C.size_t(outsBuf.Len())
-	req.outs.data = (*C.uchar)(C.CBytes(outsBuf.Bytes()))
-
-	return nil
+func (c call) setOuts(req *C.struct_grail_pygo_request, num int) {
+	req.outs.num = C.int(num)
+	req.outs.data_size = C.size_t(c.outsBuf.Len())
+	req.outs.data = (*C.uchar)(C.CBytes(c.outsBuf.Bytes()))
 }
 
-// grail_pygo_free frees memory allocated by grail_pygo_call.
+// grail_pygo_free frees memory allocated by grail_pygo_call or grail_pygo_call_many.
 //export grail_pygo_free
 func grail_pygo_free(req *C.struct_grail_pygo_request) {
 	if req.outs == (C.struct_grail_pygo_tuple{}) {
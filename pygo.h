@@ -0,0 +1,43 @@
+// Types shared by pygo's cgo files and by Python (via ctypes; keep _pygo.tmpl.py in sync).
+
+#ifndef GRAIL_PYGO_H
+#define GRAIL_PYGO_H
+
+#include <stdlib.h>
+
+struct grail_pygo_tuple {
+	int num;
+	size_t data_size;
+	unsigned char *data;
+};
+
+// grail_pygo_pull_fn sets *batch to the next gob-encoded batch of items for a feed argument
+// (batch->num is 0 at the end), returning 0, or returns nonzero on error. batch's data must stay
+// valid until the next call for the same feed.
+typedef int (*grail_pygo_pull_fn)(unsigned long long feed, struct grail_pygo_tuple *batch);
+
+static inline int grail_pygo_pull(
+		grail_pygo_pull_fn pull, unsigned long long feed, struct grail_pygo_tuple *batch) {
+	return pull(feed, batch);
+}
+
+// grail_pygo_timing receives the durations, in nanoseconds, of the phases of a request.
+struct grail_pygo_timing {
+	long long decode_ns; // Finding the function and session, and decoding arguments.
+	long long call_ns;
+	long long encode_ns; // Results.
+	long long copy_ns;   // Results, to C memory.
+	long long total_ns;  // From entry to return, so callers can infer the cgo transitions' cost.
+};
+
+struct grail_pygo_request {
+	char *func_name;
+	unsigned long long session; // From grail_pygo_session_new, or 0 for a one-off gob stream.
+	grail_pygo_pull_fn pull;    // For feed arguments; may be NULL if there are none.
+	struct grail_pygo_tuple ins;
+	struct grail_pygo_tuple outs;
+	int timed;                        // If nonzero, timing is set.
+	struct grail_pygo_timing timing;
+};
+
+#endif
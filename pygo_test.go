@@ -0,0 +1,191 @@
+package pygo
+
+import (
+	"bytes"
+	"encoding/gob"
+	"fmt"
+	"reflect"
+	"strings"
+	"testing"
+	"time"
+)
+
+// These mirror pygotesting/pygobench, which measures calls from Python.
+
+type benchRecord struct {
+	Name  string
+	ID    int
+	Score float64
+	Tags  []string
+}
+
+func init() {
+	Register("bench_noop", func() {})
+	Register("bench_int", func(n int) int { return n + 1 })
+	Register("bench_string", func(s string) string { return s })
+	Register("bench_floats", func(fs []float64) []float64 { return fs })
+	Register("bench_map", func(m map[string]int) map[string]int { return m })
+	Register("bench_structs", func(rs []benchRecord) []benchRecord { return rs })
+}
+
+// benchArgs returns arguments (of about size elements) for each bench_ function.
+func benchArgs(size int) map[string][]interface{} {
+	floats := make([]float64, size)
+	m := make(map[string]int, size)
+	records := make([]benchRecord, size)
+	for i := range floats {
+		floats[i] = float64(i) + 0.5
+		m[fmt.Sprint("key", i)] = i + 1
+		records[i] = benchRecord{fmt.Sprint("name", i), i + 1, float64(i) + 0.5, []string{"a", "b"}}
+	}
+	return map[string][]interface{}{
+		"bench_noop":    nil,
+		"bench_int":     {size},
+		"bench_string":  {strings.Repeat("x", size)},
+		"bench_floats":  {floats},
+		"bench_map":     {m},
+		"bench_structs": {records},
+	}
+}
+
+// encodeCall returns a call's encoded arguments, for the first call in a stream (with type
+// descriptors) and for later ones.
+func encodeCall(t testing.TB, args []interface{}) (first, later []byte) {
+	var buf bytes.Buffer
+	enc := gob.NewEncoder(&buf)
+	for i := 0; i < 2; i++ {
+		buf.Reset()
+		for _, arg := range args {
+			if err := enc.Encode(arg); err != nil {
+				t.Fatal(err)
+			}
+		}
+		if i == 0 {
+			first = append([]byte(nil), buf.Bytes()...)
+		}
+	}
+	return first, buf.Bytes()
+}
+
+func TestGoRequest(t *testing.T) {
+	for _, session := range []bool{false, true} {
+		for name, args := range benchArgs(3) {
+			r := newGoRequest(name, session)
+			first, later := encodeCall(t, args)
+			var dec *gob.Decoder
+			var outs bytes.Buffer
+			for i := 0; i < 3; i++ {
+				ins := later
+				if i == 0 || !session {
+					ins = first
+				}
+				got, errMsg := r.call(len(args), ins)
+				if errMsg != "" {
+					t.Fatalf("%s: %s", name, errMsg)
+				}
+				if dec == nil || !session {
+					outs.Reset()
+					dec = gob.NewDecoder(&outs)
+				}
+				outs.Write(got)
+				if len(args) == 0 {
+					continue
+				}
+				out := reflect.New(reflect.TypeOf(args[0]))
+				if err := dec.DecodeValue(out); err != nil {
+					t.Fatalf("%s: %v", name, err)
+				}
+				want := args[0]
+				if name == "bench_int" {
+					want = args[0].(int) + 1
+				}
+				if !reflect.DeepEqual(out.Elem().Interface(), want) {
+					t.Errorf("%s: got %v, want %v", name, out.Elem(), want)
+				}
+			}
+			r.free()
+		}
+	}
+	r := newGoRequest("bench_int", false)
+	defer r.free()
+	if _, errMsg := r.call(1, []byte("x")); errMsg == "" {
+		t.Error("want error for bad arguments")
+	}
+}
+
+func TestTiming(t *testing.T) {
+	r := newGoRequest("bench_floats", true)
+	defer r.free()
+	first, _ := encodeCall(t, benchArgs(4096)["bench_floats"])
+	r.setTimed(true)
+	if _, errMsg := r.call(1, first); errMsg != "" {
+		t.Fatal(errMsg)
+	}
+	phases := r.timing()
+	var sum time.Duration
+	for _, d := range phases[:4] {
+		if d < 0 {
+			t.Errorf("negative phase: %v", phases)
+		}
+		sum += d
+	}
+	if phases[4] <= 0 || sum > phases[4] {
+		t.Errorf("phases %v don't add up to the total", phases)
+	}
+}
+
+// BenchmarkCall measures grail_pygo_call alone, for comparison with call_bench.py, which includes
+// Python's costs. Bytes are those of encoded arguments.
+func BenchmarkCall(b *testing.B) {
+	names := []string{"bench_noop", "bench_int", "bench_string", "bench_floats", "bench_map", "bench_structs"}
+	for _, size := range []int{1, 64, 4096} {
+		for _, name := range names {
+			args := benchArgs(size)[name]
+			if size > 1 && (name == "bench_noop" || name == "bench_int") {
+				continue // Not sized.
+			}
+			first, later := encodeCall(b, args)
+			for _, session := range []bool{true, false} {
+				ins := first
+				if session {
+					ins = later
+				}
+				b.Run(fmt.Sprintf("%s/size=%d/session=%t", name, size, session), func(b *testing.B) {
+					benchmarkCall(b, name, len(args), first, ins, session)
+				})
+			}
+			b.Run(fmt.Sprintf("%s/size=%d/parallel", name, size), func(b *testing.B) {
+				b.SetBytes(int64(len(later)))
+				b.RunParallel(func(pb *testing.PB) {
+					r := newGoRequest(name, true)
+					defer r.free()
+					if _, errMsg := r.call(len(args), first); errMsg != "" {
+						b.Error(errMsg)
+						return
+					}
+					for pb.Next() {
+						if _, errMsg := r.call(len(args), later); errMsg != "" {
+							b.Error(errMsg)
+							return
+						}
+					}
+				})
+			})
+		}
+	}
+}
+
+func benchmarkCall(b *testing.B, name string, num int, first, ins []byte, session bool) {
+	r := newGoRequest(name, session)
+	defer r.free()
+	if _, errMsg := r.call(num, first); errMsg != "" {
+		b.Fatal(errMsg)
+	}
+	b.SetBytes(int64(len(ins)))
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		if _, errMsg := r.call(num, ins); errMsg != "" {
+			b.Fatal(errMsg)
+		}
+	}
+}
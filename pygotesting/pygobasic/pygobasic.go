@@ -35,6 +35,21 @@ func init() {
 		}
 		return items
 	})
+	// test_ListS3_stream is like test_ListS3, but yields paths as they're listed.
+	pygo.Register("test_ListS3_stream", func(dir string) func(func(string) bool) {
+		return func(yield func(string) bool) {
+			ctx := backgroundcontext.Get()
+			lister := file.List(ctx, "s3://commoncrawl/", false)
+			for lister.Scan() {
+				if !yield(lister.Path()) {
+					return
+				}
+			}
+			if err := lister.Err(); err != nil {
+				panic(err)
+			}
+		}
+	})
 
 	type test1 struct {
 		A int
@@ -117,6 +132,128 @@ func init() {
 	pygo.Register("test_gorecv_nan", func(got float64) {
 		must.Truef(math.IsNaN(got), "float got %f, want NaN", got)
 	})
+	pygo.Register("test_gorecv_array", func(got [3]int) {
+		must.Truef(got == [3]int{7, 8, 9}, "array got %v, want [7 8 9]", got)
+	})
+	pygo.Register("test_buffer_scale", func(b pygo.Buffer, k float64) {
+		fs := b.Float64s()
+		for i := range fs {
+			fs[i] *= k
+		}
+	})
+	pygo.Register("test_buffer_arange", func(rows, cols int) pygo.Buffer {
+		b, ints := pygo.NewInt64Buffer(rows, cols)
+		for i := range ints {
+			ints[i] = int64(i)
+		}
+		return b
+	})
+	pygo.Register("test_sum_float64s", func(fs []float64) float64 {
+		var sum float64
+		for _, f := range fs {
+			sum += f
+		}
+		return sum
+	})
+	pygo.Register("test_stream_chan", func(n int) <-chan int {
+		ch := make(chan int)
+		go func() {
+			defer close(ch)
+			for i := 0; i < n; i++ {
+				ch <- i
+			}
+		}()
+		return ch
+	})
+	pygo.Register("test_stream_iter", func(n int) func(func(string) bool) {
+		return func(yield func(string) bool) {
+			for i := 0; n < 0 || i < n; i++ {
+				if !yield(fmt.Sprint(i)) {
+					return
+				}
+			}
+		}
+	})
+	pygo.Register("test_stream_panic", func() func(func(int) bool) {
+		return func(yield func(int) bool) {
+			yield(1)
+			panic("test_stream_panic")
+		}
+	})
+	pygo.Register("test_feed_sum", func(fs <-chan float64) float64 {
+		var sum float64
+		for f := range fs {
+			sum += f
+		}
+		return sum
+	})
+	pygo.Register("test_feed_first", func(n int, next func() (string, bool)) []string {
+		var ss []string
+		for s, ok := next(); ok && len(ss) < n; s, ok = next() {
+			ss = append(ss, s)
+		}
+		return ss
+	})
+	pygo.Register("test_handle_new", func(words []string) pygo.Handle {
+		index := map[string]int{}
+		for i, w := range words {
+			index[w] = i
+		}
+		return pygo.NewHandle(index)
+	})
+	pygo.Register("test_handle_lookup", func(h pygo.Handle, word string) int {
+		i, ok := h.Value().(map[string]int)[word]
+		if !ok {
+			return -1
+		}
+		return i
+	})
+	type testRow struct {
+		ID    int
+		Score float64
+		OK    bool
+	}
+	pygo.Register("test_columns", func(n int) []testRow {
+		rows := make([]testRow, n)
+		for i := range rows {
+			rows[i] = testRow{i, float64(i) / 2, i%3 == 0}
+		}
+		return rows
+	})
+	// test_user_types returns structs named (and shaped) like pygo's Handle and Buffer, which must
+	// decode as ordinary structs.
+	type Handle struct{ ID int }
+	type Buffer struct {
+		Ptr            int
+		DType          string
+		Shape, Strides []int
+	}
+	pygo.Register("test_user_types", func() (Handle, Buffer) {
+		return Handle{ID: 1}, Buffer{Ptr: 2, DType: "<f8", Shape: []int{1}, Strides: []int{8}}
+	})
+	// test_columns_named returns a slice of testRows followed by another field, which the columnar
+	// decoder must not read into.
+	type testNamedRows struct {
+		Rows []testRow
+		Name string
+	}
+	pygo.Register("test_columns_named", func(n int, name string) testNamedRows {
+		rows := make([]testRow, n)
+		for i := range rows {
+			rows[i] = testRow{i, float64(i) / 2, i%3 == 0}
+		}
+		return testNamedRows{rows, name}
+	})
+	// test_spin burns CPU without allocating, for benchmarking concurrent calls.
+	pygo.Register("test_spin", func(iters int) uint64 {
+		x := uint64(iters)
+		for i := 0; i < iters; i++ {
+			x ^= x << 13
+			x ^= x >> 7
+			x ^= x << 17
+		}
+		return x
+	})
 }
 
 func main() { pygo.Main() }
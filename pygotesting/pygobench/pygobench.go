@@ -0,0 +1,39 @@
+// pygobench registers functions for measuring call overhead from Python; see
+// python/pygo/pygotesting/call_bench.py. BenchmarkCall in package pygo measures the same calls
+// without Python.
+package main
+
+import "github.com/josh-newman/pygo"
+
+type record struct {
+	Name  string
+	ID    int
+	Score float64
+	Tags  []string
+}
+
+func init() {
+	pygo.Register("bench_noop", func() {})
+	pygo.Register("bench_int", func(n int) int { return n + 1 })
+	pygo.Register("bench_string", func(s string) string { return s })
+	pygo.Register("bench_floats", func(fs []float64) []float64 { return fs })
+	pygo.Register("bench_map", func(m map[string]int) map[string]int { return m })
+	pygo.Register("bench_structs", func(rs []record) []record { return rs })
+	// bench_buffer_sum and bench_buffer_new pass arrays without copying them.
+	pygo.Register("bench_buffer_sum", func(b pygo.Buffer) float64 {
+		var sum float64
+		for _, f := range b.Float64s() {
+			sum += f
+		}
+		return sum
+	})
+	pygo.Register("bench_buffer_new", func(n int) pygo.Buffer {
+		b, fs := pygo.NewFloat64Buffer(n)
+		for i := range fs {
+			fs[i] = float64(i)
+		}
+		return b
+	})
+}
+
+func main() { pygo.Main() }
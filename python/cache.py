@@ -1,16 +1,90 @@
+import collections
+import collections.abc
+import concurrent.futures
+import contextlib
+import dataclasses
+import fcntl
+import functools
+import hashlib
 import inspect
+import mmap
 import os
 import pickle
 import re
+import sqlite3
+import struct
+import sys
 import tempfile
+import threading
+import time
 import typing
 import weakref
 
 
 class Cache:
-    def __init__(self, disk_path: typing.Optional[str] = None):
+    def __init__(
+        self,
+        disk_path: typing.Optional[str] = None,
+        mem_bytes: typing.Optional[int] = None,
+        mmap_arrays=False,
+        hashed_keys=False,
+        lock_timeout: typing.Optional[float] = None,
+        stats_hook: typing.Optional[typing.Callable[[str, str, float], None]] = None,
+        write_behind=False,
+        io_threads=8,
+    ):
+        """
+        mem_bytes limits the (approximate) size of results kept in memory for `mem=True`; least
+        recently used ones are evicted beyond that, and reloaded from disk when needed again. By
+        default, memory is unbounded. With mem_bytes, `weakmem=True` results that don't support
+        weak references (dicts, lists, ints, ...) are kept as for `mem=True`; without, they're
+        reloaded each time.
+
+        If mmap_arrays, large buffers in results (such as ndarray data) are written separately
+        from the pickle (protocol 5, out-of-band), and loaded as read-only memory maps, so loads
+        don't copy them and processes share the page cache. Such files load this way regardless
+        of mmap_arrays.
+
+        If hashed_keys, results are stored under a hash of a canonical encoding of the arguments
+        (see _encode_key), as <function>/ab/cd/abcd..., rather than under a filename formed from
+        the arguments' strings, which can collide or exceed filename limits. Each stored result is
+        also recorded, with its size and creation and access times, in an index in disk_path,
+        which `entries` reads, so finding results doesn't need a directory scan. Access times are
+        written in batches, so a process's most recent ones are lost if it exits without `flush`.
+
+        When several threads or processes miss the same result, one computes it while the others
+        wait, then load it. Threads wait on a lock in this Cache, and processes on a file lock
+        (flock) next to the result, which is released if its holder dies. lock_timeout (seconds)
+        bounds the wait, after which TimeoutError is raised; by default, waits are unbounded.
+
+        Activity is counted per function (see Stats, and `stats`). stats_hook, if given, is also
+        called with each increment, as stats_hook(fn_name, counter, amount), e.g.
+        ("features", "compute_seconds", 12.5), to export them to a metrics system.
+
+        If write_behind, computed results are returned immediately and stored by background
+        threads; `flush` waits for the stores (and raises their errors). Until a result is stored,
+        other processes don't see it (and may compute it too). Results must not be modified.
+
+        io_threads bounds the background threads used for write_behind and `prefetch`.
+        """
         self.cache_dir = disk_path
-        self.mem = {}
+        self.mmap_arrays = mmap_arrays
+        self.hashed_keys = hashed_keys
+        self.lock_timeout = lock_timeout
+        self._key_locks = _KeyLocks()
+        self._index = _Index(os.path.join(disk_path, _INDEX_NAME)) if hashed_keys else None
+        self.stats_hook = stats_hook
+        self._stats = collections.defaultdict(Stats)
+        self._stats_lock = threading.Lock()
+        self.write_behind = write_behind
+        self.io_threads = io_threads
+        self._io_lock = threading.Lock()
+        self._pool = None  # Created on first use.
+        self._prefetched = {}  # filename -> Future of the result, or _MISSING if not stored.
+        self._writing = {}  # filename -> result being stored.
+        self._writes = set()  # Futures of stores.
+        self._write_errors = []
+        self.mem = _Memory(mem_bytes, evict=self._evicted)
         self.weakmem = {}
 
     def path(self, *args, extra_key=None, **kwargs):
@@ -18,11 +92,7 @@ class Cache:
         Path returns a file path within the cache directory. Use when `fn`'s management of
         computation is not desired.
         """
-        filename = os.path.join(
-            self.cache_dir,
-            inspect.stack()[1].function,
-            _format_filename(*args, extra_key=extra_key, **kwargs),
-        )
+        filename = self._filename(sys._getframe(1).f_code.co_name, args, kwargs, extra_key)
         cache_dir = os.path.dirname(filename)
         os.makedirs(cache_dir, exist_ok=True)
         return filename
@@ -32,43 +102,308 @@ class Cache:
         Cache the value returned by result using a cache key generated from function name
         and args.
         """
-        filename = os.path.join(
-            self.cache_dir,
-            inspect.stack()[1].function,
-            _format_filename(*args, extra_key=extra_key, **kwargs),
-        )
+        fn_name = sys._getframe(1).f_code.co_name
+        filename = self._filename(fn_name, args, kwargs, extra_key)
+        return self._load(fn_name, filename, result, mem=mem, weakmem=weakmem)
+
+    def memoize(self, fn=None, *, mem=False, weakmem=False, extra_key=None):
+        """
+        Decorator that caches fn's results like `fn`, keyed by fn's name and its (bound) arguments:
+
+            @cache.memoize(mem=True)
+            def features(sample, k=8): ...
+
+        The function's identity and signature are resolved once, here. Calls are keyed by the
+        same filename as `fn` computes, in memory as well as on disk, so equal but differently
+        typed arguments (e.g. (1,) and (1.0,)) don't share a result in one tier but not the other.
+        Filenames of calls with simple arguments (see _memo_key) are remembered, so with mem or
+        weakmem, repeating such a call costs a few dictionary lookups.
+        """
+        if fn is None:
+            return functools.partial(self.memoize, mem=mem, weakmem=weakmem, extra_key=extra_key)
+        assert not (mem and weakmem)
+        signature = inspect.signature(fn)
+        # filenames maps _memo_key of a call's raw arguments to its cache filename.
+        filenames = {}
+
+        def filename_of(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return self._filename(fn.__name__, bound.args, bound.kwargs, extra_key)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _memo_key(args)
+            if kwargs and key is not None:
+                kwargs_key = _memo_key(tuple(sorted(kwargs.items())))
+                key = None if kwargs_key is None else (key, kwargs_key)
+            filename = None if key is None else filenames.get(key)
+            if filename is not None and (mem or weakmem):
+                r = self._get_mem(fn.__name__, filename, mem=mem, weakmem=weakmem)
+                if r is not _MISSING:
+                    return r
+            if filename is None:
+                filename = filename_of(args, kwargs)
+                if key is not None:
+                    if len(filenames) >= _memoize_max_calls:
+                        filenames.clear()
+                    filenames[key] = filename
+            return self._load(
+                fn.__name__, filename, lambda: fn(*args, **kwargs), mem=mem, weakmem=weakmem
+            )
+
+        def prefetch(arg_tuples: typing.Iterable[tuple]):
+            "Like Cache.prefetch, for calls with the given positional arguments."
+            self._prefetch(fn.__name__, [filename_of(args, {}) for args in arg_tuples])
+
+        wrapper.prefetch = prefetch
+        return wrapper
+
+    def prefetch(self, fn_name: str, arg_tuples: typing.Iterable[tuple], extra_key=None):
+        """
+        Starts loading the stored results of calls from function fn_name (that use `fn`) with the
+        given positional arguments, in parallel, so that later calls don't wait for the disk.
+        Results not stored yet are skipped. Each prefetched result is kept until its first use,
+        so prefetch only what will be used. Memoized functions have a similar `prefetch` method.
+        """
+        filenames = [self._filename(fn_name, args, {}, extra_key) for args in arg_tuples]
+        self._prefetch(fn_name, filenames)
+
+    def flush(self):
+        """
+        Waits for results being stored (see write_behind), raising the first error, if any, and
+        writes pending access times to the hashed_keys index.
+        """
+        with self._io_lock:
+            writes = list(self._writes)
+        concurrent.futures.wait(writes)
+        if self._index is not None:
+            self._index.flush()
+        with self._io_lock:
+            errors, self._write_errors = self._write_errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        "Flushes, and stops background threads. The Cache remains usable."
+        self.flush()
+        with self._io_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def stats(self) -> typing.Dict[str, "Stats"]:
+        "Returns a snapshot of the counters, by function name."
+        with self._stats_lock:
+            return {fn_name: dataclasses.replace(s) for fn_name, s in self._stats.items()}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+    def entries(self, fn_name: typing.Optional[str] = None) -> typing.List["Entry"]:
+        """
+        Returns the results stored with hashed_keys (for fn_name, if given), least recently
+        accessed first. Paths are relative to the cache directory.
+        """
+        assert self.hashed_keys, "entries needs hashed_keys"
+        return self._index.entries(fn_name)
+
+    def remove(self, entry: "Entry"):
+        "Removes a result returned by `entries` from disk and the index."
+        assert self.hashed_keys, "remove needs hashed_keys"
+        try:
+            os.remove(os.path.join(self.cache_dir, entry.path))
+        except FileNotFoundError:
+            pass
+        self._index.remove(entry.path)
+
+    def _filename(self, fn_name: str, args, kwargs, extra_key) -> str:
+        if not self.hashed_keys:
+            return os.path.join(
+                self.cache_dir, fn_name, _format_filename(*args, extra_key=extra_key, **kwargs)
+            )
+        h = hashlib.sha256()
+        _encode_key(h.update, (extra_key, tuple(args), kwargs))
+        key = h.hexdigest()
+        return os.path.join(self.cache_dir, fn_name, key[:2], key[2:4], key)
+
+    def _get_mem(self, fn_name: str, filename: str, mem=False, weakmem=False):
+        "Returns filename's result from memory (for mem or weakmem), or _MISSING."
+        r = None
+        if weakmem:
+            r = self.weakmem.get(filename)
+            if r is not None:
+                r = r()
+        if r is None:
+            r = self.mem.get(filename, _MISSING)
+        if r is not _MISSING:
+            self._count(fn_name, mem_hits=1)
+        return r
 
+    def _load(self, fn_name: str, filename: str, result, mem=False, weakmem=False):
         def from_disk():
+            r = self._take_pending(fn_name, filename)
+            if r is not _MISSING:
+                return r
             if not os.path.exists(filename):
-                r = result()
-                cache_dir = os.path.dirname(filename)
-                os.makedirs(cache_dir, exist_ok=True)
-                tmpf, tmpname = tempfile.mkstemp(dir=cache_dir)
-                os.close(tmpf)
-                try:
-                    with open(tmpname, "wb") as f:
-                        pickle.dump(r, f)
-                except:
-                    os.remove(tmpname)
-                    raise
-                os.rename(tmpname, filename)
-            with open(filename, "rb") as f:
-                return pickle.load(f)
+                with self._locked(filename):
+                    # Another thread or process may have stored it while we waited.
+                    r = self._take_pending(fn_name, filename)
+                    if r is not _MISSING:
+                        return r
+                    if not os.path.exists(filename):
+                        start = time.perf_counter()
+                        r = result()
+                        self._count(fn_name, misses=1, compute_seconds=time.perf_counter() - start)
+                        if self.write_behind:
+                            self._store_behind(filename, r)
+                            return r
+                        self._store(filename, r)
+                        return self._read(fn_name, filename)
+            self._count(fn_name, disk_hits=1)
+            if self._index is not None:
+                self._index.accessed(self._relpath(filename))
+            return self._read(fn_name, filename)
 
         assert not (mem and weakmem)
+        if mem or weakmem:
+            obj = self._get_mem(fn_name, filename, mem=mem, weakmem=weakmem)
+            if obj is not _MISSING:
+                return obj
+        obj = from_disk()
         if mem:
-            if filename not in self.mem:
-                self.mem[filename] = from_disk()
-            return self.mem[filename]
-        if weakmem:
-            if filename in self.weakmem:
-                obj = self.weakmem[filename]()
-                if obj is not None:
-                    return obj
-            obj = from_disk()
-            self.weakmem[filename] = weakref.ref(obj)
-            return obj
-        return from_disk()
+            self.mem[filename] = obj
+        elif weakmem:
+            try:
+                self.weakmem[filename] = weakref.ref(obj)
+            except TypeError:
+                # Many common results (dict, list, int, ...) don't support weakrefs. Keep them in
+                # the memory tier instead, if it's bounded; otherwise they'd never be released.
+                if self.mem.max_bytes is not None:
+                    self.mem[filename] = obj
+        return obj
+
+    @contextlib.contextmanager
+    def _locked(self, filename: str):
+        "Locks filename against computation by other threads and processes."
+        deadline = None if self.lock_timeout is None else time.monotonic() + self.lock_timeout
+        with self._key_locks.hold(filename, deadline), _file_lock(filename, deadline):
+            yield
+
+    def _executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        "Returns the pool for background I/O. Requires _io_lock."
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(
+                self.io_threads, thread_name_prefix="cache"
+            )
+        return self._pool
+
+    def _prefetch(self, fn_name: str, filenames: typing.List[str]):
+        with self._io_lock:
+            pool = self._executor()
+            for filename in filenames:
+                if filename not in self._prefetched:
+                    read = pool.submit(self._read_if_stored, fn_name, filename)
+                    self._prefetched[filename] = read
+
+    def _read_if_stored(self, fn_name: str, filename: str):
+        if not os.path.exists(filename):
+            return _MISSING
+        self._count(fn_name, disk_hits=1)
+        if self._index is not None:
+            self._index.accessed(self._relpath(filename))
+        return self._read(fn_name, filename)
+
+    def _take_pending(self, fn_name: str, filename: str):
+        "Returns filename's result if it's being stored or was prefetched, or _MISSING."
+        with self._io_lock:
+            r = self._writing.get(filename, _MISSING)
+            prefetched = self._prefetched.pop(filename, None)
+        if r is not _MISSING:
+            self._count(fn_name, mem_hits=1)
+            return r
+        if prefetched is None:
+            return _MISSING
+        try:
+            return prefetched.result()
+        except Exception:
+            # Load it again, in the caller, to report errors there.
+            return _MISSING
+
+    def _store_behind(self, filename: str, r):
+        def store():
+            try:
+                self._store(filename, r)
+            finally:
+                with self._io_lock:
+                    if self._writing.get(filename) is r:
+                        del self._writing[filename]
+
+        def done(write: concurrent.futures.Future):
+            with self._io_lock:
+                self._writes.discard(write)
+                if write.exception() is not None:
+                    self._write_errors.append(write.exception())
+
+        with self._io_lock:
+            self._writing[filename] = r
+            write = self._executor().submit(store)
+            self._writes.add(write)
+        write.add_done_callback(done)
+
+    def _read(self, fn_name: str, filename: str):
+        start = time.perf_counter()
+        r = _read(filename)
+        self._count(
+            fn_name,
+            load_seconds=time.perf_counter() - start,
+            bytes_read=os.path.getsize(filename),
+        )
+        return r
+
+    def _store(self, filename: str, r):
+        _store(filename, r, self.mmap_arrays)
+        size = os.path.getsize(filename)
+        relpath = self._relpath(filename)
+        self._count(relpath.split(os.sep, 1)[0], bytes_written=size)
+        if self._index is not None:
+            self._index.add(relpath, size)
+
+    def _evicted(self, filename: str, r):
+        "Demotes an evicted in-memory result to disk. Usually it's there already."
+        self._count(self._relpath(filename).split(os.sep, 1)[0], evictions=1)
+        with self._io_lock:
+            # A write-behind store will put it there.
+            pending = filename in self._writing
+        if not pending and not os.path.exists(filename):
+            self._store(filename, r)
+
+    def _relpath(self, filename: str) -> str:
+        return os.path.relpath(filename, self.cache_dir)
+
+    def _count(self, fn_name: str, **amounts):
+        with self._stats_lock:
+            s = self._stats[fn_name]
+            for counter, amount in amounts.items():
+                setattr(s, counter, getattr(s, counter) + amount)
+        if self.stats_hook is not None:
+            for counter, amount in amounts.items():
+                self.stats_hook(fn_name, counter, amount)
+
+
+@dataclasses.dataclass
+class Stats:
+    "Stats counts a function's cache activity, since the Cache was created or its stats reset."
+
+    mem_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0  # Computed results.
+    compute_seconds: float = 0.0
+    load_seconds: float = 0.0  # Reading (and unpickling) results from disk, including after misses.
+    bytes_read: int = 0
+    bytes_written: int = 0
+    evictions: int = 0  # From memory, for mem_bytes.
 
 
 def from_relpath(relpath: str, tmpdir="/mnt/data/tmp"):
@@ -77,11 +412,464 @@ def from_relpath(relpath: str, tmpdir="/mnt/data/tmp"):
             tmpdir,
             "py.nb.fncache",
             relpath,
-            os.path.basename(inspect.stack()[1].filename),
+            os.path.basename(sys._getframe(1).f_code.co_filename),
         )
     )
 
 
+_MISSING = object()
+
+# _memoize_max_calls bounds the memory used to map arguments to filenames, per function.
+_memoize_max_calls = 1 << 16
+
+_memo_scalar_types = frozenset((type(None), bool, int, str, bytes))
+
+
+def _memo_key(obj):
+    """
+    Returns a hashable key for obj that differs for equal values of different types (like 1, 1.0,
+    and True) or filenames (like 0.0 and -0.0), or None if obj isn't made of tuples and scalars.
+    """
+    t = type(obj)
+    if t in _memo_scalar_types:
+        return (t, obj)
+    if t is float:
+        return (t, obj.hex())
+    if t is tuple:
+        items = tuple(map(_memo_key, obj))
+        return None if None in items else (t, items)
+    return None
+
+
+class _Memory(collections.abc.MutableMapping):
+    """
+    _Memory maps filenames to results. If max_bytes is not None, it evicts least recently used
+    results to stay within max_bytes (by _sizeof), passing them to evict(filename, result).
+    It's safe to use from several threads; evict is called without its lock held.
+    """
+
+    def __init__(self, max_bytes: typing.Optional[int], evict):
+        self.max_bytes = max_bytes
+        self.evict = evict
+        self.nbytes = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # filename -> (result, nbytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __contains__(self, filename: str):
+        return filename in self._entries
+
+    def __getitem__(self, filename: str):
+        r = self.get(filename, _MISSING)
+        if r is _MISSING:
+            raise KeyError(filename)
+        return r
+
+    def get(self, filename: str, default=None):
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is None:
+                return default
+            if self.max_bytes is not None:
+                self._entries.move_to_end(filename)
+            return entry[0]
+
+    def __setitem__(self, filename: str, result):
+        nbytes = 0 if self.max_bytes is None else _sizeof(result)
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(filename, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[filename] = (result, nbytes)
+            self.nbytes += nbytes
+            if self.max_bytes is not None:
+                # Evict down to the budget; a result larger than the whole budget isn't kept,
+                # either.
+                while self.nbytes > self.max_bytes and self._entries:
+                    evicted_filename, (evicted_result, evicted_nbytes) = self._entries.popitem(
+                        last=False
+                    )
+                    self.nbytes -= evicted_nbytes
+                    evicted.append((evicted_filename, evicted_result))
+        for evicted_filename, evicted_result in evicted:
+            self.evict(evicted_filename, evicted_result)
+
+    def __delitem__(self, filename: str):
+        "Removes filename's result from memory (only; it isn't passed to evict)."
+        with self._lock:
+            _, nbytes = self._entries.pop(filename)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+def _sizeof(obj) -> int:
+    "Returns the approximate memory used by obj."
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    nbytes = getattr(obj, "nbytes", None)  # ndarray.
+    if isinstance(nbytes, int):
+        return nbytes
+    # Out-of-band buffers (e.g. ndarray data nested in obj) are counted without being copied.
+    buffer_bytes = 0
+
+    def count(buf: pickle.PickleBuffer):
+        nonlocal buffer_bytes
+        buffer_bytes += buf.raw().nbytes
+        return False
+
+    try:
+        return len(pickle.dumps(obj, protocol=5, buffer_callback=count)) + buffer_bytes
+    except Exception:
+        return sys.getsizeof(obj)
+
+
+class Entry(typing.NamedTuple):
+    "Entry describes a result stored with hashed_keys."
+
+    path: str  # Relative to the cache directory.
+    fn_name: str
+    size: int  # In bytes, on disk.
+    created: float  # Seconds since the epoch.
+    accessed: float  # Last load from disk; loads from memory aren't recorded.
+
+
+_INDEX_NAME = "index.sqlite"
+
+
+class _Index:
+    """
+    _Index records the results stored in a cache directory, in SQLite, which makes it safe to
+    share between threads and processes.
+
+    Each process opens its own connection when it first uses the index, since SQLite connections
+    mustn't be used across fork(). Access times are recorded in batches (see accessed).
+    """
+
+    def __init__(self, filename: str):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self._filename = filename
+        self._lock = threading.Lock()
+        self._db = None  # Opened on first use, in each process.
+        self._accessed = {}  # path -> time of an access not written yet.
+        self._accessed_since = 0.0  # time.monotonic() of the oldest of _accessed.
+        _indexes.add(self)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            if self._db is None:
+                self._db = self._connect()
+            with self._db:
+                yield self._db
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._filename, timeout=60, check_same_thread=False)
+        with db:
+            # WAL lets readers proceed during writes; an index update lost in a crash only costs
+            # an entry's metadata, so commits aren't synced.
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (path TEXT PRIMARY KEY, fn_name TEXT,"
+                " size INTEGER, created REAL, accessed REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_fn_name ON entries (fn_name)")
+        return db
+
+    def _after_fork(self):
+        # The parent's connection must not be used, or closed (which may remove the WAL its
+        # other connections use), so it's kept unreferenced by the index. A thread in the parent
+        # may have held the lock at fork(). Accesses not written yet are the parent's to write.
+        if self._db is not None:
+            _forked_connections.append(self._db)
+        self._db = None
+        self._lock = threading.Lock()
+        self._accessed = {}
+
+    def add(self, path: str, size: int):
+        now = time.time()
+        fn_name = path.split(os.sep, 1)[0]
+        with self._transaction() as db:
+            self._accessed.pop(path, None)
+            db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (path, fn_name, size, now, now),
+            )
+
+    def accessed(self, path: str):
+        """
+        Records a load of path. Loads are written together, after _index_flush_seconds or
+        _index_flush_entries, rather than each in its own write transaction.
+        """
+        now, since = time.time(), time.monotonic()
+        with self._lock:
+            if not self._accessed:
+                self._accessed_since = since
+            self._accessed[path] = now
+            if (
+                len(self._accessed) < _index_flush_entries
+                and since - self._accessed_since < _index_flush_seconds
+            ):
+                return
+        self.flush()
+
+    def flush(self):
+        "Writes the access times recorded by accessed."
+        with self._transaction() as db:
+            accessed, self._accessed = self._accessed, {}
+            if accessed:
+                db.executemany(
+                    "UPDATE entries SET accessed = ? WHERE path = ?",
+                    [(t, path) for path, t in accessed.items()],
+                )
+
+    def remove(self, path: str):
+        with self._transaction() as db:
+            self._accessed.pop(path, None)
+            db.execute("DELETE FROM entries WHERE path = ?", (path,))
+
+    def entries(self, fn_name: typing.Optional[str]) -> typing.List[Entry]:
+        self.flush()
+        query = "SELECT path, fn_name, size, created, accessed FROM entries"
+        params = ()
+        if fn_name is not None:
+            query += " WHERE fn_name = ?"
+            params = (fn_name,)
+        with self._transaction() as db:
+            rows = db.execute(query + " ORDER BY accessed", params).fetchall()
+        return [Entry(*row) for row in rows]
+
+
+# Access times are written when _index_flush_entries are pending, or the oldest has been for
+# _index_flush_seconds, on the next access; and by entries and Cache.flush.
+_index_flush_entries = 1024
+_index_flush_seconds = 5.0
+
+_indexes = weakref.WeakSet()
+# _forked_connections holds connections inherited from a parent process, so they're never used or
+# closed.
+_forked_connections = []
+
+
+def _after_fork():
+    for index in list(_indexes):
+        index._after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _encode_key(write, obj):
+    """
+    Writes a canonical encoding of obj: equal arguments encode equally, regardless of dict and set
+    order, and different ones (including of different types, like 1 and "1") differently.
+    Unfamiliar types are encoded by pickle.
+    """
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(obj, np.generic):
+        # Scalars' reprs (and pickles) vary between NumPy versions, but their bytes don't.
+        b = obj.tobytes()
+        write(b"ng:%s:%d:%s" % (obj.dtype.str.encode(), len(b), b))
+    elif obj is None or isinstance(obj, (bool, int, float, complex)):
+        b = repr(obj).encode()
+        write(b"%s:%d:%s" % (type(obj).__name__.encode(), len(b), b))
+    elif isinstance(obj, str):
+        b = obj.encode("utf-8", "surrogatepass")
+        write(b"s:%d:%s" % (len(b), b))
+    elif isinstance(obj, bytes):
+        write(b"b:%d:%s" % (len(obj), obj))
+    elif isinstance(obj, (tuple, list)):
+        write(b"%s:%d:" % (type(obj).__name__.encode(), len(obj)))
+        for item in obj:
+            _encode_key(write, item)
+    elif isinstance(obj, (dict, set, frozenset)):
+        # Order by encoding, so the result doesn't depend on insertion (or hash) order.
+        items = obj.items() if isinstance(obj, dict) else ((item,) for item in obj)
+        encoded = []
+        for item in items:
+            parts = []
+            _encode_key(parts.append, item)
+            encoded.append(b"".join(parts))
+        write(b"%s:%d:" % (type(obj).__name__.encode(), len(encoded)))
+        for b in sorted(encoded):
+            write(b)
+    elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        write(b"dc:%s:" % _qualname(type(obj)))
+        _encode_key(write, {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)})
+    elif type(obj).__module__ == "numpy" and type(obj).__name__ == "ndarray":
+        if obj.dtype.hasobject:
+            write(b"ndo:%s:" % repr(obj.shape).encode())
+            _encode_key(write, obj.ravel().tolist())
+            return
+        write(b"nd:%s:%s:" % (obj.dtype.str.encode(), repr(obj.shape).encode()))
+        write(obj.tobytes())
+    else:
+        b = pickle.dumps(obj, protocol=4)
+        write(b"p:%s:%d:%s" % (_qualname(type(obj)), len(b), b))
+
+
+def _qualname(t: type) -> bytes:
+    return f"{t.__module__}.{t.__qualname__}".encode()
+
+
+class _KeyLocks:
+    "_KeyLocks hands out a lock per key, kept only while some thread holds or waits for it."
+
+    def __init__(self):
+        self._mu = threading.Lock()
+        self._locks = {}  # key -> [lock, number of holders and waiters]
+
+    @contextlib.contextmanager
+    def hold(self, key, deadline: typing.Optional[float]):
+        with self._mu:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            timeout = -1 if deadline is None else max(0, deadline - time.monotonic())
+            if not entry[0].acquire(timeout=timeout):
+                raise TimeoutError(f"cache: timed out waiting for {key}")
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._mu:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
+# _lock_poll_max is the longest time, in seconds, between attempts to take a file lock with a
+# deadline.
+_lock_poll_max = 0.1
+
+
+@contextlib.contextmanager
+def _file_lock(filename: str, deadline: typing.Optional[float]):
+    """
+    Holds an exclusive flock on filename + ".lock", which is removed on release. The kernel
+    releases flocks of processes that exit, so a crashed holder only leaves the file behind.
+    """
+    lockname = filename + ".lock"
+    os.makedirs(os.path.dirname(lockname), exist_ok=True)
+    delay = 0.001
+    while True:
+        fd = os.open(lockname, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if deadline is None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"cache: timed out waiting for lock {lockname}")
+            time.sleep(min(delay, remaining))
+            delay = min(2 * delay, _lock_poll_max)
+            continue
+        except:
+            os.close(fd)
+            raise
+        # The previous holder removes the file before releasing it, so the file we locked may
+        # no longer be the lock; then try again.
+        try:
+            st, fst = os.stat(lockname), os.fstat(fd)
+            if (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino):
+                break
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+    try:
+        yield
+    finally:
+        os.remove(lockname)
+        os.close(fd)
+
+
+# Files written with mmap_arrays start with _MMAP_MAGIC, then a header of little-endian uint64s:
+# the pickle's length, the number of out-of-band buffers, and each buffer's offset and length.
+# The pickle follows the header; buffers follow, each at a multiple of _MMAP_ALIGN. Other files
+# are plain pickles.
+_MMAP_MAGIC = b"\x00pygo.cache.p5\n"
+_MMAP_ALIGN = 64
+# _mmap_min_bytes is the size from which buffers are written out-of-band.
+_mmap_min_bytes = 1 << 16
+
+
+def _store(filename: str, r, mmap_arrays=False):
+    "Writes r to filename, atomically."
+    cache_dir = os.path.dirname(filename)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmpf, tmpname = tempfile.mkstemp(dir=cache_dir)
+    os.close(tmpf)
+    try:
+        with open(tmpname, "wb") as f:
+            if mmap_arrays:
+                _write_mmap(f, r)
+            else:
+                pickle.dump(r, f)
+    except:
+        os.remove(tmpname)
+        raise
+    os.rename(tmpname, filename)
+
+
+def _write_mmap(f, r):
+    buffers = []
+
+    def in_band(buf: pickle.PickleBuffer) -> bool:
+        try:
+            raw = buf.raw()
+        except BufferError:  # Not contiguous.
+            return True
+        if raw.nbytes < _mmap_min_bytes:
+            return True
+        buffers.append(raw)
+        return False
+
+    data = pickle.dumps(r, protocol=5, buffer_callback=in_band)
+    header = [len(data), len(buffers)]
+    end = len(_MMAP_MAGIC) + 8 * (2 + 2 * len(buffers)) + len(data)
+    for buf in buffers:
+        end = -(-end // _MMAP_ALIGN) * _MMAP_ALIGN
+        header += [end, buf.nbytes]
+        end += buf.nbytes
+    f.write(_MMAP_MAGIC)
+    f.write(struct.pack(f"<{len(header)}Q", *header))
+    f.write(data)
+    for offset, buf in zip(header[2::2], buffers):
+        f.write(b"\x00" * (offset - f.tell()))
+        f.write(buf)
+
+
+def _read(filename: str):
+    with open(filename, "rb") as f:
+        if f.read(len(_MMAP_MAGIC)) != _MMAP_MAGIC:
+            f.seek(0)
+            return pickle.load(f)
+        data_len, num_buffers = struct.unpack("<2Q", f.read(16))
+        spans = struct.unpack(f"<{2 * num_buffers}Q", f.read(16 * num_buffers))
+        data = f.read(data_len)
+        if not num_buffers:
+            return pickle.loads(data)
+        # Arrays unpickled from read-only buffers are read-only views of the map, and keep it open.
+        mapped = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    buffers = [mapped[offset : offset + n] for offset, n in zip(spans[::2], spans[1::2])]
+    return pickle.loads(data, buffers=buffers)
+
+
 def _format_filename(*args, extra_key=None, **kwargs):
     return (
         "result_"
@@ -0,0 +1,393 @@
+import inspect
+import mmap
+import multiprocessing
+import os
+import struct
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from python import cache
+
+
+class _Result:
+    pass
+
+
+def _mapped(a: np.ndarray) -> bool:
+    "Returns whether a is a view of a memory map."
+    while isinstance(a, np.ndarray):
+        a = a.base
+    return isinstance(a, memoryview) and isinstance(a.obj, mmap.mmap)
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_fn(self):
+        c = cache.Cache(self.dir)
+        calls = []
+
+        def square(x):
+            return c.fn(lambda: calls.append(x) or x * x, x)
+
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square(3), 9)
+        self.assertEqual(calls, [3])
+        self.assertEqual(square(4), 16)
+        self.assertEqual(calls, [3, 4])
+
+    def test_memoize_types(self):
+        # Equal arguments of different types, even nested ones, are cached apart in memory as on
+        # disk.
+        for hashed_keys in (False, True):
+            c = cache.Cache(os.path.join(self.dir, str(hashed_keys)), hashed_keys=hashed_keys)
+
+            @c.memoize(mem=True)
+            def ident(x, k=1):
+                return x
+
+            for _ in range(2):
+                self.assertEqual(type(ident(1)), int)
+                self.assertEqual(type(ident(1.0)), float)
+                self.assertEqual(type(ident((1,))[0]), int)
+                self.assertEqual(type(ident((1.0,))[0]), float)
+            self.assertEqual(ident(2, k=1), ident(2))
+            self.assertEqual(c.stats()["ident"].misses, 5)
+
+    def test_memoize_hit(self):
+        c = cache.Cache(self.dir)
+
+        @c.memoize(mem=True)
+        def f(x, k=1):
+            return [x, k]
+
+        self.assertEqual(f((1, "a"), k=2.0), [(1, "a"), 2.0])
+        # Hits don't bind arguments or compute filenames.
+        with mock.patch.object(
+            inspect.Signature, "bind", side_effect=AssertionError
+        ), mock.patch.object(c, "_filename", side_effect=AssertionError):
+            self.assertEqual(f((1, "a"), k=2.0), [(1, "a"), 2.0])
+        self.assertEqual(f((1, "a"), k=2), [(1, "a"), 2])
+        self.assertEqual(f(-0.0), [0.0, 1])
+        self.assertEqual(str(f(0.0)[0]), "0.0")
+        self.assertEqual(c.stats()["f"].mem_hits, 1)
+
+    def test_weakmem(self):
+        c = cache.Cache(self.dir)
+
+        def result(x):
+            return c.fn(_Result, x, weakmem=True)
+
+        r = result(1)
+        self.assertIs(result(1), r)
+        # Results that don't support weakrefs aren't kept in an unbounded memory tier.
+        c.fn(dict, 2, weakmem=True)
+        self.assertEqual(len(c.mem), 0)
+        c = cache.Cache(self.dir, mem_bytes=1 << 20)
+        d = c.fn(dict, 2, weakmem=True)
+        self.assertIs(c.fn(dict, 2, weakmem=True), d)
+
+    def test_mem_bytes(self):
+        c = cache.Cache(self.dir, mem_bytes=2500)
+
+        def block(i):
+            return c.fn(lambda: bytes(1000), i, mem=True)
+
+        for i in range(3):
+            block(i)
+        self.assertEqual(list(c.mem), [c._filename("block", (i,), {}, None) for i in (1, 2)])
+        self.assertEqual(c.mem.nbytes, 2000)
+        self.assertEqual(c.stats()["block"].evictions, 1)
+        block(0)
+        self.assertEqual(c.stats()["block"].disk_hits, 1)
+
+        # Cache.mem is a MutableMapping.
+        filename = next(iter(c.mem))
+        self.assertEqual(c.mem.pop(filename), bytes(1000))
+        self.assertEqual(c.mem.nbytes, 1000)
+        self.assertEqual(len(dict(c.mem.items())), 1)
+        c.mem.clear()
+        self.assertEqual((len(c.mem), c.mem.nbytes), (0, 0))
+
+    def test_memory_threads(self):
+        mem = cache._Memory(5000, evict=lambda filename, r: None)
+
+        def use(k):
+            for i in range(2000):
+                mem[f"{k}/{i % 50}"] = bytes(10)
+                mem.get(f"{k}/{i % 7}")
+
+        threads = [threading.Thread(target=use, args=(k,)) for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(mem.nbytes, 10 * len(mem))
+        self.assertLessEqual(mem.nbytes, 5000)
+
+    def test_mmap_arrays(self):
+        c = cache.Cache(self.dir, mmap_arrays=True)
+        n = cache._mmap_min_bytes // 8
+
+        def arrays():
+            return c.fn(
+                lambda: {
+                    "floats": np.linspace(0, 1, n),
+                    "lists": [np.arange(n), np.arange(2 * n, dtype=np.int32).reshape(-1, 4)],
+                    "small": np.arange(10.0),
+                    "strided": np.arange(2.0 * n)[::2],
+                    "fortran": np.asfortranarray(np.arange(2.0 * n).reshape(2, -1)),
+                    "scalar": np.array(3.5),
+                }
+            )
+
+        for got in (arrays(), arrays()):  # Read back after storing, then loaded.
+            self.assertTrue(np.array_equal(got["floats"], np.linspace(0, 1, n)))
+            self.assertTrue(np.array_equal(got["lists"][0], np.arange(n)))
+            self.assertEqual(got["lists"][1].dtype, np.int32)
+            self.assertEqual(got["lists"][1].shape, (n // 2, 4))
+            self.assertTrue(np.array_equal(got["strided"], np.arange(0, 2.0 * n, 2)))
+            self.assertTrue(got["fortran"].flags.f_contiguous)
+            self.assertTrue(np.array_equal(got["fortran"], np.arange(2.0 * n).reshape(2, -1)))
+            self.assertEqual(got["scalar"].shape, ())
+            self.assertEqual(got["scalar"], 3.5)
+            for a in (got["floats"], got["lists"][0], got["lists"][1], got["fortran"]):
+                self.assertTrue(_mapped(a))
+                self.assertFalse(a.flags.writeable)
+                with self.assertRaises(ValueError):
+                    a[0] = 1
+            # Small arrays are pickled in-band, like those that aren't contiguous.
+            self.assertFalse(_mapped(got["small"]))
+            self.assertFalse(_mapped(got["strided"]))
+
+        filename = c._filename("arrays", (), {}, None)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(len(cache._MMAP_MAGIC)), cache._MMAP_MAGIC)
+            self.assertEqual(struct.unpack("<2Q", f.read(16))[1], 4)
+
+        # Files stored without mmap_arrays are plain pickles, and still load.
+        plain = os.path.join(self.dir, "plain")
+        cache._store(plain, {"floats": np.linspace(0, 1, n)})
+        got = cache._read(plain)["floats"]
+        self.assertTrue(np.array_equal(got, np.linspace(0, 1, n)))
+        self.assertFalse(_mapped(got))
+
+    def test_single_flight_threads(self):
+        c = cache.Cache(self.dir)
+        calls = []
+
+        def slow(x):
+            def compute():
+                calls.append(x)
+                time.sleep(0.1)
+                return x
+
+            return c.fn(compute, x)
+
+        threads = [threading.Thread(target=slow, args=(1,)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(c.stats()["slow"].misses, 1)
+        self.assertEqual(c.stats()["slow"].disk_hits, 7)
+
+    def test_single_flight_processes(self):
+        # The Cache (and its index) is used before fork, and by the children.
+        c = cache.Cache(self.dir, hashed_keys=True)
+        log = os.path.join(self.dir, "log")
+
+        def slow(x):
+            def compute():
+                with open(log, "a") as f:
+                    f.write(f"{os.getpid()}\n")
+                time.sleep(0.2)
+                return x
+
+            return c.fn(compute, x)
+
+        slow(0)
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=slow, args=(1,)) for _ in range(4)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        with open(log) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(slow(1), 1)
+        self.assertEqual(len(c.entries("slow")), 2)
+
+    def test_lock_timeout(self):
+        computing, done = threading.Event(), threading.Event()
+
+        def wait(c):
+            def compute():
+                computing.set()
+                done.wait()
+                return 1
+
+            return c.fn(compute)
+
+        c = cache.Cache(self.dir, lock_timeout=0.1)
+        holder = threading.Thread(target=wait, args=(c,))
+        holder.start()
+        try:
+            computing.wait()
+            # Another thread using the same Cache waits on its lock; one using another Cache (as
+            # in another process) waits on the file lock.
+            with self.assertRaises(TimeoutError):
+                wait(c)
+            with self.assertRaises(TimeoutError):
+                wait(cache.Cache(self.dir, lock_timeout=0.1))
+        finally:
+            done.set()
+            holder.join()
+        self.assertEqual(wait(cache.Cache(self.dir, lock_timeout=0.1)), 1)
+
+    def test_write_behind(self):
+        c = cache.Cache(self.dir, write_behind=True, hashed_keys=True)
+        stored = threading.Event()
+        store = cache._store
+
+        def slow_store(filename, r, mmap_arrays=False):
+            stored.wait()
+            store(filename, r, mmap_arrays)
+
+        def f(x):
+            return c.fn(lambda: [x], x)
+
+        cache._store = slow_store
+        try:
+            r = f(1)
+            self.assertEqual(r, [1])
+            # Until it's stored, the result is returned from memory, and isn't on disk.
+            self.assertIs(f(1), r)
+            filename = c._filename("f", (1,), {}, None)
+            self.assertFalse(os.path.exists(filename))
+            stored.set()
+            c.flush()
+        finally:
+            cache._store = store
+        self.assertTrue(os.path.exists(filename))
+        self.assertEqual(cache._read(filename), [1])
+        self.assertEqual(len(c.entries("f")), 1)
+        s = c.stats()["f"]
+        self.assertEqual((s.misses, s.mem_hits), (1, 1))
+
+        def fail(filename, r, mmap_arrays=False):
+            raise OSError("disk full")
+
+        cache._store = fail
+        try:
+            f(2)
+            with self.assertRaisesRegex(OSError, "disk full"):
+                c.flush()
+        finally:
+            cache._store = store
+        c.flush()  # Errors are raised once.
+        c.close()
+
+    def test_write_behind_evicted(self):
+        # Evicting a result that's being stored doesn't store it again.
+        c = cache.Cache(self.dir, write_behind=True, mem_bytes=1500)
+        stored = threading.Event()
+        store = cache._store
+        filenames = []
+
+        def slow_store(filename, r, mmap_arrays=False):
+            filenames.append(filename)
+            stored.wait(1)  # Bounded, in case the caller is the thread that would set it.
+            store(filename, r, mmap_arrays)
+
+        def block(i):
+            return c.fn(lambda: bytes(1000), i, mem=True)
+
+        cache._store = slow_store
+        try:
+            block(0)
+            block(1)
+            self.assertEqual(c.stats()["block"].evictions, 1)
+            stored.set()
+            c.flush()
+        finally:
+            cache._store = store
+        self.assertEqual(sorted(filenames), [c._filename("block", (i,), {}, None) for i in (0, 1)])
+        self.assertEqual(block(0), bytes(1000))
+        c.close()
+
+    def test_prefetch(self):
+        c = cache.Cache(self.dir)
+        calls = []
+
+        @c.memoize
+        def f(x):
+            calls.append(x)
+            return x
+
+        f(1)
+        f(2)
+        f.prefetch([(1,), (2,), (3,)])
+        self.assertEqual([f(1), f(2), f(3)], [1, 2, 3])
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(c.stats()["f"].disk_hits, 2)
+        c.close()
+
+    def test_hashed_keys(self):
+        c = cache.Cache(self.dir, hashed_keys=True)
+
+        def f(*args):
+            return c.fn(lambda: args, *args)
+
+        f(1, "a")
+        f({"b": 2, "a": 1}, np.float64(0.5))
+        # Dict order doesn't matter; types do.
+        self.assertEqual(
+            c._filename("f", ({"a": 1, "b": 2}, np.float64(0.5)), {}, None),
+            c._filename("f", ({"b": 2, "a": 1}, np.float64(0.5)), {}, None),
+        )
+        self.assertNotEqual(
+            c._filename("f", (np.float64(0.5),), {}, None),
+            c._filename("f", (0.5,), {}, None),
+        )
+        entries = c.entries("f")
+        self.assertEqual(len(entries), 2)
+        f(1, "a")
+        self.assertEqual(c.entries("f")[-1].path, c._relpath(c._filename("f", (1, "a"), {}, None)))
+        c.remove(entries[0])
+        self.assertEqual(len(c.entries()), 1)
+
+    def test_stats(self):
+        hooked = []
+        c = cache.Cache(
+            self.dir,
+            hashed_keys=True,
+            mem_bytes=1 << 20,
+            stats_hook=lambda fn_name, counter, amount: hooked.append((fn_name, counter)),
+        )
+
+        def f(x):
+            return c.fn(lambda: x, x, mem=True)
+
+        f(1)
+        f(1)
+        s = c.stats()["f"]
+        self.assertEqual((s.misses, s.mem_hits, s.disk_hits), (1, 1, 0))
+        self.assertGreater(s.bytes_written, 0)
+        self.assertIn(("f", "mem_hits"), hooked)
+        c.reset_stats()
+        self.assertEqual(c.stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
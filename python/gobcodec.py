@@ -1,7 +1,10 @@
+import array
 import collections
+import copy
 import dataclasses
 import gzip
 import io
+import operator
 import struct
 import typing
 
@@ -22,84 +25,175 @@ class Encoder:
 
     def encode(self, val) -> bytes:
         self._buf_multi.clear()
+        self.encode_into(self._buf_multi, val)
+        return bytes(self._buf_multi)
 
-        codec = self._codecs.find_codec(val)
-        new_type_ids = self._codecs.wire_types.keys() - self._seen_type_ids
-        for type_id in sorted(new_type_ids):
+    def encode_into(self, out: bytearray, val):
+        "Appends val's message (preceded by any type descriptors not yet sent) onto out."
+        plan = self._codecs.find_plan(val)
+        for type_id in plan.type_deps:
+            if type_id in self._seen_type_ids:
+                continue
             self._buf_single.clear()
             go_int_codec.encode(self._buf_single, -type_id)
             go_wire_type_codec.encode(
                 self._buf_single, self._codecs.wire_types[type_id]
             )
-            self._copy_single()
+            self._copy_single(out)
             self._seen_type_ids.add(type_id)
 
         self._buf_single.clear()
-        go_int_codec.encode(self._buf_single, self._codecs.type_ids[codec])
-        if not isinstance(codec, GoStructCodec):
-            self._buf_single.append(0)
-        codec.encode(self._buf_single, val)
-        self._copy_single()
+        self._buf_single.extend(plan.header)
+        plan.encode(self._buf_single, val)
+        self._copy_single(out)
 
-        return bytes(self._buf_multi)
+    def reset(self):
+        """
+        Forgets which type descriptors were sent, so the next value starts a new stream. Unlike
+        creating a new Encoder, this keeps type ids and compiled encode plans.
+        """
+        self._seen_type_ids.clear()
+
+    def _copy_single(self, out: bytearray):
+        go_uint_codec.encode(out, len(self._buf_single))
+        out.extend(self._buf_single)
+
+
+class Cursor:
+    """
+    Cursor is a read position within a memoryview that is shared by all cursors over the same
+    input, so messages and nested payloads are slices rather than copies.
+    """
+
+    __slots__ = ("buf", "pos", "end")
+
+    def __init__(self, buf: memoryview, pos: int = 0, end: typing.Optional[int] = None):
+        self.buf = buf
+        self.pos = pos
+        self.end = len(buf) if end is None else end
 
-    def _copy_single(self):
-        go_uint_codec.encode(self._buf_multi, len(self._buf_single))
-        self._buf_multi.extend(self._buf_single)
+    def done(self) -> bool:
+        return self.pos >= self.end
+
+    def read(self, n: int) -> memoryview:
+        start = self.pos
+        self.pos = start + n
+        assert self.pos <= self.end, f"read {n} bytes past end"
+        return self.buf[start : self.pos]
 
 
 @dataclasses.dataclass
 class Stream:
-    msg: io.BytesIO # Currently being parsed.
-    rest: io.BytesIO
+    msg: Cursor  # Currently being parsed.
+    rest: Cursor
 
     def msg_done(self) -> bool:
-        return self.msg.tell() >= len(self.msg.getvalue())
+        return self.msg.pos >= self.msg.end
 
     def pop_msg(self):
-        self.msg = self.rest
+        rest = self.msg = self.rest
         msg_len = go_uint_codec.decode(None, self)
         assert msg_len > 0
-        msg_bytes = self.rest.read(msg_len)
-        assert len(msg_bytes) == msg_len
-        self.msg = io.BytesIO(msg_bytes)
-        # import sys; print(f"****** pop {msg_len} {self.msg.tell()} {len(self.msg.getvalue())}", file=sys.stderr)            
-        # print([int(b) for b in self.msg.getvalue()[self.msg.tell():self.msg.tell()+100]], file=sys.stderr)
+        start = rest.pos
+        rest.pos += msg_len
+        assert rest.pos <= rest.end, f"message length {msg_len} past end"
+        self.msg = Cursor(rest.buf, start, rest.pos)
+
 
-def new_stream(data: io.BytesIO) -> Stream:
+def new_stream(data: Cursor) -> Stream:
     stream = Stream(None, data)
     stream.pop_msg()
     return stream
 
 
+STRUCTS_RECORD = "record"
+STRUCTS_NAMEDTUPLE = "namedtuple"
+STRUCTS_TUPLE = "tuple"
+_STRUCTS_MODES = (STRUCTS_RECORD, STRUCTS_NAMEDTUPLE, STRUCTS_TUPLE)
+
+
 class Decoder:
-    def __init__(self, known_types=tuple()):
-        self._codecs = DecodeCodecs()
-        for typ in known_types:
-            self._codecs.register(typ)
+    def __init__(
+        self,
+        known_types=tuple(),
+        numpy_slices=False,
+        structs=STRUCTS_RECORD,
+        columns=False,
+        lazy=False,
+    ):
+        """
+        If numpy_slices, slices of ints, uints, floats, and bools are decoded as np.ndarray (of
+        int64, uint64, float64, and bool, respectively) rather than lists.
+
+        If columns, slices of structs whose fields are all ints, uints, floats, bools, strings, or
+        byte strings (and that have no registered dataclass) are decoded as GoColumns, one array
+        per field, without making an object per element.
+
+        If lazy, slices, arrays, and maps are decoded as GoLazySlice and GoLazyMap, which decode
+        their elements from data (which they keep a reference to) only as they're read. Those
+        decoded in vectorized form (above), or with interfaces in their elements, aren't lazy.
+
+        structs selects what Go structs without a registered dataclass decode to:
+          STRUCTS_RECORD: a dataclass (with __slots__) generated per Go type, named after it.
+          STRUCTS_NAMEDTUPLE: a collections.namedtuple generated per Go type.
+          STRUCTS_TUPLE: a plain tuple of the field values, in Go's field order.
+        Omitted (zero-valued) fields are None. Only records can be encoded back to Go.
+        """
+        self.numpy_slices = numpy_slices
+        self.columns = columns
+        self.lazy = lazy
+        self._known_types = tuple(known_types)
+        self._codecs = DecodeCodecs(structs)
+        self._codecs.set_registered(self._known_types)
+
+    def register(self, typ: type):
+        """
+        Use dataclass typ (and its dataclass fields' types) for Go structs with the same name and
+        field names. A dataclass's Go name is its class name, or its _go_type_name class
+        attribute (a typing.ClassVar), if it has one.
+        """
+        self._known_types += (typ,)
+        self._codecs.register(typ)
 
-    # TODO: Stream?
-    def decode_one(self, data: io.BytesIO) -> typing.Any:
-        "Decode one object. Returns None at EOF."
+    def set_known_types(self, known_types):
+        """
+        Uses known_types, in addition to those passed to __init__ or register, for subsequent
+        values. Types from an earlier set_known_types call no longer apply.
+        """
+        self._codecs.set_registered(self._known_types + tuple(known_types))
+
+    def set_structs(self, structs: str):
+        "Changes the structs option (see __init__) for subsequent values."
+        self._codecs.set_structs(structs)
+
+    def decode_one(self, data: Cursor) -> typing.Any:
+        "Decode one object, advancing data past it."
 
         stream = new_stream(data)
         type_id = self._decode_type_id(stream)
         codec = self._codecs.get_codec(type_id)
         if not isinstance(codec, GoStructCodec):
-            assert stream.msg.read(1) == bytes([0])
-        val = codec.decode(self, stream)
+            assert stream.msg.read(1)[0] == 0
+        if isinstance(codec, (GoSliceCodec, GoArrayCodec, GoMapCodec)):
+            # The value fills the rest of the message, so lazy ones needn't skip to its end.
+            val = codec.decode(self, stream, whole_msg=True)
+        else:
+            val = codec.decode(self, stream)
         # import sys; print(f"****** val decode_one {type_id} {val}", file=sys.stderr)            
-        assert len(stream.msg.read()) == 0, "leftover data"
+        assert stream.msg_done(), "leftover data"
         return val
 
-    def decode_all(self, data: bytes) -> typing.Tuple[typing.Any]:
+    def decode_all(self, data) -> typing.Tuple[typing.Any]:
+        "Decode all objects in data, which may be any bytes-like object. data is not copied."
         vals = []
-        stream = io.BytesIO(data)
-        while stream.tell() < len(stream.getvalue()):
-            vals.append(self.decode_one(stream))
+        cursor = Cursor(memoryview(data).cast("B"))
+        # Lazy values keep decoding with the options in effect now.
+        decoder = copy.copy(self) if self.lazy else self
+        while not cursor.done():
+            vals.append(decoder.decode_one(cursor))
         return tuple(vals)
 
-    def skip_one(self, data: io.BytesIO):
+    def skip_one(self, data: Cursor):
         unused_stream = new_stream(data)
         return
 
@@ -129,9 +223,20 @@ class GoCodec:
         """
         raise NotImplementedError()
 
+    def compile_encode(self) -> typing.Callable[[bytearray, typing.Any], None]:
+        """
+        Returns a function equivalent to self.encode, specialized for this codec so that
+        repeated encoding of same-shaped values avoids per-value codec dispatch.
+        """
+        return self.encode
+
     def decode(self, decoder: Decoder) -> typing.Any:
         raise NotImplementedError()
 
+    def skip(self, decoder: Decoder, stream: Stream):
+        "Advances stream past a value, like decode, but without building it (if possible)."
+        self.decode(decoder, stream)
+
 
 @dataclasses.dataclass
 class GoInterfaceValue:
@@ -144,6 +249,222 @@ class GoCustomValue:
     raw: bytes
 
 
+@dataclasses.dataclass(frozen=True)
+class GoSlice:
+    """
+    GoSlice encodes vals, an np.ndarray (1-D; bool, int, uint, or float dtype) or sequence, as a
+    native Go slice. Unwrapped ndarrays use the pygonumpy custom encoding instead.
+    """
+
+    vals: typing.Any
+
+
+@dataclasses.dataclass(frozen=True)
+class GoArray:
+    "GoArray encodes vals (like GoSlice) as a Go array, [len(vals)]T."
+
+    vals: typing.Any
+
+
+@dataclasses.dataclass
+class GoColumns:
+    """
+    GoColumns is a Go slice of structs, []T, decoded field by field (see Decoder's columns
+    option). columns maps each of T's fields to an np.ndarray of its values, with zero ("" for
+    strings) where gob omitted a zero value; omitted maps each field to a bool array marking those.
+    Decode-only.
+    """
+
+    len: int
+    columns: typing.Dict[str, np.ndarray]
+    omitted: typing.Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return self.len
+
+    def masked(self, name: str) -> np.ma.MaskedArray:
+        "Returns field name's column with omitted values masked, like None in decoded structs."
+        return np.ma.MaskedArray(self.columns[name], mask=self.omitted[name])
+
+
+class GoLazySlice(collections.abc.Sequence):
+    """
+    GoLazySlice is a Go slice or array decoded lazily (see Decoder's lazy option). Each element is
+    decoded when it's first read. Reading element i first skips (without decoding) any elements
+    before it that haven't been reached yet, recording their offsets, so later reads seek directly.
+    Slicing returns a list. Decode-only.
+    """
+
+    def __init__(
+        self, decoder: Decoder, elem: GoCodec, stream: Stream, n: int, length: int, whole_msg: bool
+    ):
+        "Takes the n elements (of length) at stream, and advances it past them."
+        self._decoder = decoder
+        self._elem = elem
+        self._buf = stream.msg.buf
+        self._end = stream.msg.end
+        self._n = n  # Elements sent; the rest (of an array) are None.
+        self._len = length
+        # _offsets[i] is element i's offset in _buf, for elements reached so far.
+        self._offsets = array.array("q", [stream.msg.pos])
+        self._items = {}
+        if whole_msg:
+            stream.msg.pos = stream.msg.end
+        else:
+            stream.msg.pos = self._seek(n).msg.pos
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        i = operator.index(i)
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("GoLazySlice index out of range")
+        if i >= self._n:
+            return None
+        try:
+            return self._items[i]
+        except KeyError:
+            pass
+        stream = self._seek(i)
+        val = self._items[i] = self._elem.decode(self._decoder, stream)
+        if len(self._offsets) == i + 1:
+            self._offsets.append(stream.msg.pos)
+        return val
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, collections.abc.Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"GoLazySlice(len={self._len})"
+
+    def _seek(self, i: int) -> Stream:
+        "Returns a stream at element i (or the end, if i is n)."
+        offsets = self._offsets
+        stream = Stream(Cursor(self._buf, offsets[-1], self._end), None)
+        while len(offsets) <= i:
+            self._elem.skip(self._decoder, stream)
+            offsets.append(stream.msg.pos)
+        stream.msg.pos = offsets[i]
+        return stream
+
+
+class GoLazyMap(collections.abc.Mapping):
+    """
+    GoLazyMap is a Go map decoded lazily (see Decoder's lazy option). The first lookup (or
+    iteration) decodes the keys, skipping the values; each value is decoded when it's first read.
+    Decode-only.
+    """
+
+    def __init__(
+        self, decoder: Decoder, key: GoCodec, elem: GoCodec, stream: Stream, n: int, whole_msg: bool
+    ):
+        "Takes the n entries at stream, and advances it past them."
+        self._decoder = decoder
+        self._key = key
+        self._elem = elem
+        self._buf = stream.msg.buf
+        self._start = stream.msg.pos
+        self._end = stream.msg.end
+        self._n = n
+        # _offsets maps each key to its value's offset in _buf, once the keys are decoded.
+        self._offsets = None
+        self._items = {}
+        if whole_msg:
+            stream.msg.pos = stream.msg.end
+        else:
+            stream.msg.pos = self._index()
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self):
+        if self._offsets is None:
+            self._index()
+        return iter(self._offsets)
+
+    def __getitem__(self, k):
+        if self._offsets is None:
+            self._index()
+        offset = self._offsets[k]
+        try:
+            return self._items[k]
+        except KeyError:
+            pass
+        stream = Stream(Cursor(self._buf, offset, self._end), None)
+        val = self._items[k] = self._elem.decode(self._decoder, stream)
+        return val
+
+    def __repr__(self) -> str:
+        return f"GoLazyMap(len={self._n})"
+
+    def _index(self) -> int:
+        "Decodes the keys into _offsets, returning the offset past the last entry."
+        offsets = {}
+        stream = Stream(Cursor(self._buf, self._start, self._end), None)
+        for _ in range(self._n):
+            k = self._key.decode(self._decoder, stream)
+            offsets[k] = stream.msg.pos
+            self._elem.skip(self._decoder, stream)
+        self._offsets = offsets
+        return stream.msg.pos
+
+
+@dataclasses.dataclass
+class Buffer:
+    """
+    Buffer mirrors pygo.Buffer, which describes array memory shared between Python and Go. The
+    pygo call() wrapper converts Buffers returned by Go into ndarrays.
+    """
+
+    # pygo.Buffer's defined type, so that user structs named Buffer don't decode as Buffers.
+    _go_type_name: typing.ClassVar[str] = "PygoBuffer"
+    Ptr: int = None
+    DType: str = None
+    Shape: typing.List[int] = None
+    Strides: typing.List[int] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class GoBuffer:
+    """
+    GoBuffer passes array to Go as a pygo.Buffer that aliases array's memory, rather than copying
+    its contents. The caller must keep array alive (and unmodified) until the call returns.
+    """
+
+    array: np.ndarray
+
+    def __post_init__(self):
+        if self.array.ndim == 0:
+            raise ValueError("GoBuffer requires at least one dimension")
+
+    # These mirror Buffer's fields, so GoBuffer encodes with Buffer's codec.
+
+    @property
+    def Ptr(self) -> int:
+        return self.array.ctypes.data
+
+    @property
+    def DType(self) -> str:
+        return self.array.dtype.str
+
+    @property
+    def Shape(self) -> typing.List[int]:
+        return list(self.array.shape)
+
+    @property
+    def Strides(self) -> typing.List[int]:
+        return list(self.array.strides)
+
+
 @dataclasses.dataclass(frozen=True)
 class GoInterfaceCodec(GoCodec):
     # TODO: encode.
@@ -163,139 +484,503 @@ class GoInterfaceCodec(GoCodec):
         # print([int(b) for b in stream.msg.getvalue()[stream.msg.tell():stream.msg.tell()+unused_msg_len]], file=sys.stderr)
         codec = decoder._codecs.get_codec(type_id)
         if not isinstance(codec, GoStructCodec):
-            assert sub_stream.msg.read(1) == bytes([0])
+            assert sub_stream.msg.read(1)[0] == 0
         val = GoInterfaceValue(concrete_type, codec.decode(decoder, sub_stream))
-        leftover = sub_stream.msg.read()
-        assert len(leftover) == 0, f"leftover data ({len(leftover)}) {[int(b) for b in leftover[:100]]}"
+        leftover = sub_stream.msg.buf[sub_stream.msg.pos : sub_stream.msg.end]
+        assert len(leftover) == 0, f"leftover data ({len(leftover)}) {list(leftover[:100])}"
         # import sys; print(f"****** val iface decode {type_id} {val}", file=sys.stderr)            
         return val
 
+    def skip(self, decoder: Decoder, stream: Stream):
+        if go_string_codec.decode(None, stream) == "":
+            return
+        # Any types sent with the value must still be registered.
+        decoder._decode_type_id(stream)
+        new_stream(stream.msg)
+
+
+def _encode_uint(buf: bytearray, n: int):
+    if n <= 0x7F:
+        if n < 0:
+            raise ValueError(n)
+        buf.append(n)
+        return
+    nbytes = (n.bit_length() + 7) // 8
+    if nbytes > 8:
+        raise OverflowError(n)
+    buf.append(256 - nbytes)
+    buf += n.to_bytes(nbytes, "big")
+
+
+def _encode_int(buf: bytearray, n: int):
+    n = n << 1 if n >= 0 else (~n << 1) | 1
+    if n <= 0x7F:
+        buf.append(n)
+    else:
+        _encode_uint(buf, n)
+
+
+def _encode_bool(buf: bytearray, b: bool):
+    buf.append(1 if b else 0)
+
+
+_float_struct = struct.Struct("<d")
+
+
+def _encode_float(buf: bytearray, f: float):
+    _encode_uint(buf, int.from_bytes(_float_struct.pack(f), "big"))
+
+
+def _encode_bytes(buf: bytearray, b):
+    _encode_uint(buf, len(b))
+    buf += b
+
+
+def _encode_string(buf: bytearray, s: str):
+    _encode_bytes(buf, s.encode("utf-8"))
+
+
+def _decode_uint(msg: Cursor) -> int:
+    pos = msg.pos
+    assert pos < msg.end, "read past end"
+    n = msg.buf[pos]
+    if n <= 0x7F:
+        msg.pos = pos + 1
+        return n
+    end = msg.pos = pos + 257 - n
+    assert end <= msg.end, "read past end"
+    return int.from_bytes(msg.buf[pos + 1 : end], "big")
+
+
+def _decode_bytes_view(msg: Cursor) -> memoryview:
+    "Returns a view of the next byte string in msg, without copying."
+    return msg.read(_decode_uint(msg))
+
+
+def _skip_uint(msg: Cursor):
+    pos = msg.pos
+    assert pos < msg.end, "read past end"
+    n = msg.buf[pos]
+    msg.pos = pos + (1 if n <= 0x7F else 257 - n)
+    assert msg.pos <= msg.end, "read past end"
+
+
+def _skip_bytes(msg: Cursor):
+    n = _decode_uint(msg)
+    msg.pos += n
+    assert msg.pos <= msg.end, "read past end"
+
+
+def _in_one_msg(codec: GoCodec) -> bool:
+    """
+    Whether values of codec are always within one gob message. A value continues in a later
+    message if a concrete type (of an interface value) is first sent in the middle of it.
+    """
+    if isinstance(codec, GoInterfaceCodec):
+        return False
+    if isinstance(codec, GoStructCodec):
+        return all(_in_one_msg(field) for field in codec.fields)
+    if isinstance(codec, (GoSliceCodec, GoArrayCodec)):
+        return _in_one_msg(codec.elem)
+    if isinstance(codec, GoMapCodec):
+        return _in_one_msg(codec.key) and _in_one_msg(codec.elem)
+    return True
+
+
+def _skip_elems(elem: GoCodec, decoder: Decoder, stream: Stream, n: int):
+    if elem in _numpy_slice_elems and n >= _numpy_slice_min_len:
+        _decode_uint_array(stream.msg, n)
+        return
+    skip = elem.skip
+    for _ in range(n):
+        skip(decoder, stream)
+
+
+_numpy_slice_min_len = 64
+"Below this length, coding slices element-by-element is faster than the vectorized path."
+
+_numpy_chunk_len = 1 << 16
+"_encode_uint_array processes at most this many elements at once, to bound temporary memory."
+
+
+def _compile_encode_elems(elem: GoCodec) -> typing.Callable[[bytearray, typing.Any], None]:
+    "Returns an encoder for the count and elements of a slice or array of elem."
+    encode_elem = elem.compile_encode()
+    dtype_kind = _numpy_slice_kinds.get(elem)
+
+    def encode(buf: bytearray, s):
+        if type(s) is GoSlice:
+            s = s.vals
+        if dtype_kind:
+            if isinstance(s, np.ndarray):
+                _encode_uint(buf, len(s))
+                _encode_uint_array(buf, _uints_from_numpy(s))
+                return
+            if len(s) >= _numpy_slice_min_len:
+                # Lists that NumPy converts to the expected kind are homogeneous (ints can't
+                # overflow, etc.), so they encode the same as element-by-element.
+                arr = np.array(s)
+                if arr.dtype.kind == dtype_kind and arr.ndim == 1:
+                    _encode_uint(buf, len(s))
+                    _encode_uint_array(buf, _uints_from_numpy(arr))
+                    return
+        _encode_uint(buf, len(s))
+        for e in s:
+            encode_elem(buf, e)
+
+    return encode
+
+
+def _uints_from_numpy(arr: np.ndarray) -> np.ndarray:
+    "Returns the gob uint representation of arr's elements, as in GoIntCodec.encode etc."
+    kind = arr.dtype.kind
+    if kind == "i":
+        arr = arr.astype(np.int64, copy=False)
+        return ((arr << 1) ^ (arr >> 63)).view(np.uint64)
+    if kind == "f":
+        # gob sends floats byte-reversed.
+        return arr.astype(np.float64, copy=False).view(np.uint64).byteswap()
+    if kind in "ub":
+        return arr.astype(np.uint64, copy=False)
+    raise NotImplementedError(f"dtype {arr.dtype}")
+
+
+def _encode_uint_array(buf: bytearray, u: np.ndarray):
+    "Appends gob uints u (a uint64 array) to buf, as consecutive go_uint_codec.encode calls."
+    for lo in range(0, len(u), _numpy_chunk_len):
+        chunk = u[lo : lo + _numpy_chunk_len]
+        payload = np.zeros(len(chunk), dtype=np.int64)
+        for i in range(8):
+            payload += chunk >= np.uint64(1 << (8 * i))
+        payload[chunk <= 0x7F] = 0
+        lens = 1 + payload
+        heads = np.cumsum(lens) - lens
+        out = np.empty(int(heads[-1] + lens[-1]), dtype=np.uint8)
+        is_head = np.zeros(len(out), dtype=bool)
+        is_head[heads] = True
+        out[heads] = np.where(payload == 0, (chunk & np.uint64(0x7F)).astype(np.int64), 256 - payload)
+        big_endian = chunk.astype(">u8").view(np.uint8).reshape(len(chunk), 8)
+        out[~is_head] = big_endian[np.arange(8) >= 8 - payload[:, None]]
+        buf += memoryview(out)
+
+_uint_masks = np.array(
+    [0xFF] + [(1 << (8 * i)) - 1 for i in range(1, 9)], dtype=np.uint64
+)
+"_uint_masks[k] selects the value bits of the 8 bytes ending at a uint with k payload bytes."
+
+
+def _decode_uint_array(msg: Cursor, n: int) -> np.ndarray:
+    "Decodes n consecutive gob uints from msg into a uint64 array."
+    limit = min(msg.end - msg.pos, 9 * n)  # Each uint is at most 9 bytes.
+    region = np.frombuffer(msg.buf, dtype=np.uint8, count=limit, offset=msg.pos)
+    if n == 0:
+        return np.empty(0, dtype=np.uint64)
+
+    first = int(region[0])
+    width = 1 if first <= 0x7F else 257 - first
+    heads = region[: width * n : width]
+    if len(heads) == n and np.all(heads <= 0x7F if width == 1 else heads == first):
+        # Fast path: every element has the same width (e.g. small ints).
+        if width == 1:
+            msg.pos += n
+            return heads.astype(np.uint64)
+        starts = np.arange(0, width * n, width)
+    else:
+        starts = _uint_array_starts(region, n)
+    uints, lasts = _uints_at(region, starts)
+    assert lasts[-1] < limit, "read past end"
+    msg.pos += int(lasts[-1]) + 1
+    return uints
+
+
+def _uints_at(region: np.ndarray, starts: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Decodes the gob uints starting at offsets starts in region. Returns them (as uint64) and the
+    offset of each one's last byte, which callers must check is within region.
+    """
+    heads = region[starts]
+    payload = np.where(heads <= 0x7F, 0, 256 - heads.astype(np.int16))
+    lasts = starts + payload
+    # words[i] is the big-endian uint64 formed by the 8 bytes ending at region[i].
+    padded = np.zeros(len(region) + 7, dtype=np.uint8)
+    padded[7:] = region
+    words = np.ndarray((len(region),), dtype=">u8", buffer=padded, strides=(1,))
+    uints = words[np.minimum(lasts, len(region) - 1)].astype(np.uint64)
+    uints &= _uint_masks[payload]
+    return uints, lasts
+
+
+def _uint_array_starts(region: np.ndarray, n: typing.Optional[int]) -> np.ndarray:
+    """
+    Returns offsets of the first n gob uints in region, or of all that start in region if n is
+    None.
+
+    Element boundaries depend on each element's first byte, so the true chain of starts is
+    sequential. Instead, we follow a speculative chain from the beginning of each fixed-size block,
+    for all blocks in parallel. A varint chain usually converges with the true one within a few
+    elements, so resolving the true chain only takes a few Python-level steps per block: the true
+    chain is walked from its first start in each block until it reaches a speculative start, from
+    which point they coincide.
+    """
+    limit = len(region)
+    block = max(64, int((8 * limit) ** 0.5))
+    nblocks = (limit + block - 1) // block
+    block_ends = np.minimum(np.arange(1, nblocks + 1) * block, limit)
+
+    starts = np.zeros(limit, dtype=bool)
+    cur = np.arange(nblocks) * block
+    active = np.arange(nblocks)
+    while len(active):
+        pos = cur[active]
+        starts[pos] = True
+        heads = region[pos]
+        cur[active] = pos + np.where(heads <= 0x7F, 1, 257 - heads.astype(np.int64))
+        active = active[cur[active] < block_ends[active]]
+
+    walked = []
+    pos = 0
+    for i in range(nblocks):
+        begin, end = i * block, int(block_ends[i])
+        while pos < end and not starts[pos]:
+            walked.append(pos)
+            head = int(region[pos])
+            pos += 1 if head <= 0x7F else 257 - head
+        starts[begin:pos] = False
+        if pos < end:
+            pos = int(cur[i])
+    starts[walked] = True
+
+    if n is None:
+        return np.flatnonzero(starts)
+    starts = np.flatnonzero(starts)[:n]
+    assert len(starts) == n, "read past end"
+    return starts
+
+
+def _ints_from_uints(u: np.ndarray) -> np.ndarray:
+    return ((u >> np.uint64(1)) ^ (np.uint64(0) - (u & np.uint64(1)))).view(np.int64)
+
+
+def _floats_from_uints(u: np.ndarray) -> np.ndarray:
+    # gob sends floats byte-reversed.
+    return u.byteswap().view(np.float64)
+
+
+def _bools_from_uints(u: np.ndarray) -> np.ndarray:
+    assert np.all(u <= 1), "invalid bool"
+    return u.astype(bool)
+
 
 @dataclasses.dataclass(frozen=True)
 class GoUintCodec(GoCodec):
     def encode(self, buf: bytearray, n: int):
-        if n < 0:
-            raise ValueError(n)
-        if n <= 0x7F:
-            buf.append(n)
-            return
-        nbytes = (n.bit_length() + 7) // 8
-        buf.append(256 - nbytes)
-        buf.extend(struct.pack(">Q", n)[-nbytes:])
+        _encode_uint(buf, n)
 
     def decode(self, unused_decoder: Decoder, stream: Stream) -> int:
-        n = int(stream.msg.read(1)[0])
-        if n <= 0x7F:
-            return n
-        nbytes = 256 - n
-        buf = bytearray(struct.calcsize(">Q"))
-        buf[-nbytes:] = stream.msg.read(nbytes)
-        (n,) = struct.unpack(">Q", buf)
-        return n
+        return _decode_uint(stream.msg)
+
+    def skip(self, unused_decoder: Decoder, stream: Stream):
+        _skip_uint(stream.msg)
 
 
 @dataclasses.dataclass(frozen=True)
 class GoIntCodec(GoCodec):
     def encode(self, buf: bytearray, n: int):
-        go_uint_codec.encode(buf, n << 1 if n >= 0 else (~n << 1) | 1)
+        _encode_int(buf, n)
+
+    def compile_encode(self):
+        return _encode_int
 
     def decode(self, decoder: Decoder, stream: Stream) -> int:
-        n = go_uint_codec.decode(None, stream)
+        n = _decode_uint(stream.msg)
         return ~(n >> 1) if (n & 1) else (n >> 1)
 
+    def skip(self, unused_decoder: Decoder, stream: Stream):
+        _skip_uint(stream.msg)
+
 
 @dataclasses.dataclass(frozen=True)
 class GoBoolCodec(GoCodec):
     def encode(self, buf: bytearray, b: bool):
-        go_uint_codec.encode(buf, 1 if b else 0)
+        _encode_bool(buf, b)
+
+    def compile_encode(self):
+        return _encode_bool
 
     def decode(self, unused_decoder: Decoder, stream: Stream) -> bool:
-        return {0: False, 1: True}[go_uint_codec.decode(None, stream)]
+        return {0: False, 1: True}[_decode_uint(stream.msg)]
+
+    def skip(self, unused_decoder: Decoder, stream: Stream):
+        _skip_uint(stream.msg)
 
 
 @dataclasses.dataclass(frozen=True)
 class GoFloatCodec(GoCodec):
     def encode(self, buf: bytearray, f: float):
-        (byte_reversed,) = struct.unpack(">Q", struct.pack("<d", f))
-        go_uint_codec.encode(buf, byte_reversed)
+        _encode_float(buf, f)
+
+    def compile_encode(self):
+        return _encode_float
 
     def decode(self, unused_decoder: Decoder, stream: Stream) -> float:
-        byte_reversed = go_uint_codec.decode(None, stream)
-        return struct.unpack("<d", struct.pack(">Q", byte_reversed))[0]
+        byte_reversed = _decode_uint(stream.msg)
+        return _float_struct.unpack(byte_reversed.to_bytes(8, "big"))[0]
+
+    def skip(self, unused_decoder: Decoder, stream: Stream):
+        _skip_uint(stream.msg)
 
 
 @dataclasses.dataclass(frozen=True)
 class GoBytesCodec(GoCodec):
     def encode(self, buf: bytearray, b):
-        go_uint_codec.encode(buf, len(b))
-        buf.extend(b)
+        _encode_bytes(buf, b)
+
+    def compile_encode(self):
+        return _encode_bytes
 
     def decode(self, unused_decoder: Decoder, stream: Stream) -> bytes:
-        n = go_uint_codec.decode(None, stream)
-        val = stream.msg.read(n)
-        assert len(val) == n
-        return val
+        return bytes(_decode_bytes_view(stream.msg))
+
+    def skip(self, unused_decoder: Decoder, stream: Stream):
+        _skip_bytes(stream.msg)
 
 
 @dataclasses.dataclass(frozen=True)
 class GoStringCodec(GoCodec):
     def encode(self, buf: bytearray, s):
-        go_bytes_codec.encode(buf, s.encode("utf-8"))
+        _encode_string(buf, s)
+
+    def compile_encode(self):
+        return _encode_string
 
     def decode(self, unused_decoder: Decoder, stream: Stream) -> str:
-        return go_bytes_codec.decode(None, stream).decode("utf-8")
+        return str(_decode_bytes_view(stream.msg), "utf-8")
+
+    def skip(self, unused_decoder: Decoder, stream: Stream):
+        _skip_bytes(stream.msg)
 
 
 @dataclasses.dataclass(frozen=True)
 class GoSliceCodec(GoCodec):
     elem: GoCodec
 
+    def __post_init__(self):
+        # Lazy decoding needs elements in one message. (Others are decoded eagerly.)
+        object.__setattr__(self, "_lazy", _in_one_msg(self.elem))
+
     def encode(self, buf: bytearray, s: collections.abc.Sequence):
         go_uint_codec.encode(buf, len(s))
         for elem in s:
             self.elem.encode(buf, elem)
 
-    def decode(self, decoder: Decoder, stream: Stream) -> list:
-        n = go_uint_codec.decode(None, stream)
+    def compile_encode(self):
+        return _compile_encode_elems(self.elem)
+
+    def decode(self, decoder: Decoder, stream: Stream, whole_msg=False) -> list:
+        n = _decode_uint(stream.msg)
+        if (
+            decoder is not None
+            and decoder.columns
+            and isinstance(self.elem, GoStructCodec)
+            and self.elem.column_names is not None
+        ):
+            return self.elem.decode_columns(decoder, stream, n)
+        from_uints = _numpy_slice_elems.get(self.elem)
+        if from_uints:
+            if decoder is not None and decoder.numpy_slices:
+                return from_uints(_decode_uint_array(stream.msg, n))
+            if n >= _numpy_slice_min_len:
+                return from_uints(_decode_uint_array(stream.msg, n)).tolist()
+        elif decoder is not None and decoder.lazy and self._lazy:
+            return GoLazySlice(decoder, self.elem, stream, n, n, whole_msg)
         return [self.elem.decode(decoder, stream) for _ in range(n)]
 
+    def skip(self, decoder: Decoder, stream: Stream):
+        _skip_elems(self.elem, decoder, stream, _decode_uint(stream.msg))
+
 
 @dataclasses.dataclass(frozen=True)
 class GoArrayCodec(GoCodec):
     elem: GoCodec
     len: int
 
-    # encode not supported; see TODO below.
+    def __post_init__(self):
+        lazy = _in_one_msg(self.elem) and self.elem not in _numpy_slice_elems
+        object.__setattr__(self, "_lazy", lazy)
 
-    def decode(self, decoder: Decoder, stream: Stream) -> list:
+    def encode(self, buf: bytearray, s):
+        self.compile_encode()(buf, s)
+
+    def compile_encode(self):
+        encode_elems = _compile_encode_elems(self.elem)
+
+        def encode(buf: bytearray, s):
+            if isinstance(s, GoArray):
+                s = s.vals
+            if len(s) != self.len:
+                raise ValueError(f"array len {self.len} got {len(s)} elements")
+            encode_elems(buf, s)
+
+        return encode
+
+    def decode(self, decoder: Decoder, stream: Stream, whole_msg=False) -> list:
         n = go_uint_codec.decode(decoder, stream)
         assert n <= self.len, f"array len {self.len} got {n} elements"
+        if decoder is not None and decoder.lazy and self._lazy:
+            return GoLazySlice(decoder, self.elem, stream, n, self.len, whole_msg)
         return [self.elem.decode(decoder, stream) for _ in range(n)] + ([None] * (self.len - n))
 
+    def skip(self, decoder: Decoder, stream: Stream):
+        _skip_elems(self.elem, decoder, stream, _decode_uint(stream.msg))
+
 
 @dataclasses.dataclass(frozen=True)
 class GoMapCodec(GoCodec):
     key: GoCodec
     elem: GoCodec
 
+    def __post_init__(self):
+        object.__setattr__(self, "_lazy", _in_one_msg(self.key) and _in_one_msg(self.elem))
+
     def encode(self, buf: bytearray, m: collections.abc.Mapping):
         go_uint_codec.encode(buf, len(m))
         for k, v in m.items():
             self.key.encode(buf, k)
             self.elem.encode(buf, v)
 
-    def decode(self, decoder: Decoder, stream: Stream) -> dict:
+    def compile_encode(self):
+        encode_key, encode_elem = self.key.compile_encode(), self.elem.compile_encode()
+
+        def encode(buf: bytearray, m: collections.abc.Mapping):
+            _encode_uint(buf, len(m))
+            for k, v in m.items():
+                encode_key(buf, k)
+                encode_elem(buf, v)
+
+        return encode
+
+    def decode(self, decoder: Decoder, stream: Stream, whole_msg=False) -> dict:
+        n = go_uint_codec.decode(None, stream)
+        if decoder is not None and decoder.lazy and self._lazy:
+            return GoLazyMap(decoder, self.key, self.elem, stream, n, whole_msg)
         d = {}
-        for _ in range(go_uint_codec.decode(None, stream)):
+        for _ in range(n):
             k, v = self.key.decode(decoder, stream), self.elem.decode(decoder, stream)
             d[k] = v
         return d
 
+    def skip(self, decoder: Decoder, stream: Stream):
+        for _ in range(_decode_uint(stream.msg)):
+            self.key.skip(decoder, stream)
+            self.elem.skip(decoder, stream)
+
 
 @dataclasses.dataclass(frozen=True)
 class GoStructCodec(GoCodec):
     DataClass: type
     fields: typing.Tuple[GoCodec]
+    # column_names are the field names, if slices of this type may be decoded as GoColumns.
+    column_names: typing.Optional[typing.Tuple[str, ...]] = None
 
     def encode(self, buf: bytearray, d):
         delta = 0
@@ -308,21 +993,156 @@ class GoStructCodec(GoCodec):
                 delta = 0
         go_uint_codec.encode(buf, 0)
 
+    def compile_encode(self):
+        fields = tuple(
+            (field.name, codec.compile_encode())
+            for field, codec in zip(dataclasses.fields(self.DataClass), self.fields)
+        )
+
+        def encode(buf: bytearray, d):
+            delta = 0
+            for name, encode_field in fields:
+                delta += 1
+                elem = getattr(d, name)
+                if elem is not None:
+                    _encode_uint(buf, delta)
+                    encode_field(buf, elem)
+                    delta = 0
+            buf.append(0)
+
+        return encode
+
+    def __post_init__(self):
+        # Precompiled for decode: field decoders by index, and the constructor taking the values
+        # (in field order) positionally.
+        cls = self.DataClass
+        if cls is tuple:
+            make = tuple
+        elif hasattr(cls, "_make"):  # namedtuple.
+            make = cls._make
+        else:
+            make = lambda vals: cls(*vals)
+        object.__setattr__(self, "_decoders", tuple(codec.decode for codec in self.fields))
+        object.__setattr__(self, "_skippers", tuple(codec.skip for codec in self.fields))
+        object.__setattr__(self, "_make", make)
+
     def decode(self, decoder: Decoder, stream: Stream):  # -> self.DataClass
-        fields = dataclasses.fields(self.DataClass)
-        vals = {}
+        decoders = self._decoders
+        vals = [None] * len(decoders)
+        msg = stream.msg
         idx = -1
         while True:
-            delta = go_uint_codec.decode(None, stream)
+            delta = _decode_uint(msg)
             if delta == 0:
                 break
             idx += delta
-            # if idx >= len(self.fields):
-            #     print(f"error! struct: {self.DataClass}, {fields}, {idx}, {vals}")
-            # import sys; print(f"struct field: {self.DataClass.__name__}.{fields[idx].name}", file=sys.stderr)
-            vals[fields[idx].name] = self.fields[idx].decode(decoder, stream)
-        # import sys; print(f"done struct: {self.DataClass}. vals: {vals}", file=sys.stderr)
-        return self.DataClass(**vals)
+            vals[idx] = decoders[idx](decoder, stream)
+        return self._make(vals)
+
+    def skip(self, decoder: Decoder, stream: Stream):
+        skippers = self._skippers
+        msg = stream.msg
+        idx = -1
+        while True:
+            delta = _decode_uint(msg)
+            if delta == 0:
+                break
+            idx += delta
+            skippers[idx](decoder, stream)
+
+    def decode_columns(self, decoder: Decoder, stream: Stream, n: int) -> GoColumns:
+        "Decodes n values (the elements of a slice) as columns."
+        decoded = None
+        if all(codec in _numpy_slice_elems for codec in self.fields):
+            decoded = self._decode_uint_columns(stream.msg, n)
+        columns, omitted = decoded or self._decode_columns_by_row(decoder, stream, n)
+        return GoColumns(
+            n, dict(zip(self.column_names, columns)), dict(zip(self.column_names, omitted))
+        )
+
+    def _decode_uint_columns(self, msg: Cursor, n: int):
+        """
+        Decodes n values whose fields are all sent as single uints, with vectorized operations.
+
+        Each value is a sequence of uints: (field delta, field value) pairs, then 0. encoding/gob
+        omits zero-valued fields, and deltas are positive, so the 0s are exactly the values' ends.
+        Returns None, without consuming msg, if a value has a zero field (as other encoders
+        may send).
+        """
+        nfields = len(self.fields)
+        omitted = [np.ones(n, dtype=bool) for _ in range(nfields)]
+        columns = [np.zeros(n, dtype=_column_dtypes[codec]) for codec in self.fields]
+        if n == 0:
+            return columns, omitted
+        # Each value is at most 1 + nfields * (9 + 9) bytes.
+        limit = min(msg.end - msg.pos, n * (1 + 18 * nfields))
+        region = np.frombuffer(msg.buf, dtype=np.uint8, count=limit, offset=msg.pos)
+        if np.all(region <= 0x7F):
+            starts = np.arange(limit)
+        else:
+            starts = _uint_array_starts(region, None)
+        # region may extend past the slice, into bytes that aren't uints, so find its end (the
+        # n-th 0, which encoding/gob sends as a single 0 byte) before decoding.
+        heads = region[starts]
+        ends = np.flatnonzero(heads == 0)[:n]
+        assert len(ends) == n, "read past end"
+        count = int(ends[-1]) + 1
+        starts, heads = starts[:count], heads[:count]
+        if np.any((heads > 0x7F) & (heads < 0xF8)):
+            return None  # Not a uint; let the row-by-row decoder report it.
+        uints, lasts = _uints_at(region, starts)
+        assert lasts[-1] < limit, "read past end"
+        end = int(lasts[-1]) + 1
+        del starts, heads, lasts
+        if np.count_nonzero(uints == 0) != n:
+            return None  # A multi-byte 0.
+
+        # Without the 0s, the uints are (delta, value) pairs, pairs[r] of them for value r. (A
+        # zero field would end a value early, after an odd number of uints.)
+        lens = np.diff(ends, prepend=-1) - 1
+        if np.any(lens % 2):
+            return None
+        pairs = lens // 2
+        uints = uints[uints != 0]
+        deltas, vals = uints[0::2].astype(np.int64), uints[1::2]
+        row = np.repeat(np.arange(n), pairs)
+        # A field's index is the sum of the deltas up to it, within its value.
+        field = np.cumsum(deltas)
+        row_base = np.concatenate(([0], field))[np.cumsum(pairs) - pairs]
+        field -= row_base[row] + 1
+        assert np.all(field < nfields), "invalid struct field"
+
+        for idx, codec in enumerate(self.fields):
+            selected = field == idx
+            rows = row[selected]
+            columns[idx][rows] = _numpy_slice_elems[codec](vals[selected])
+            omitted[idx][rows] = False
+        msg.pos += end
+        return columns, omitted
+
+    def _decode_columns_by_row(self, decoder: Decoder, stream: Stream, n: int):
+        "Decodes n values into per-field lists, without making an object per value."
+        decoders = self._decoders
+        values = [[None] * n for _ in decoders]
+        msg = stream.msg
+        for i in range(n):
+            idx = -1
+            while True:
+                delta = _decode_uint(msg)
+                if delta == 0:
+                    break
+                idx += delta
+                values[idx][i] = decoders[idx](decoder, stream)
+        columns, omitted = [], []
+        for codec, vals in zip(self.fields, values):
+            dtype = _column_dtypes[codec]
+            zero = dtype().item() if dtype is not object else _column_zeros[codec]
+            missing = np.fromiter((v is None for v in vals), dtype=bool, count=n)
+            column = np.empty(n, dtype=dtype)
+            column[:] = [zero if v is None else v for v in vals]
+            columns.append(column)
+            omitted.append(missing)
+        return columns, omitted
 
 
 _numpy_custom_prefix = b"pygo.numpy:"
@@ -334,13 +1154,16 @@ class GoCustomDecoder(GoCodec):
         raise NotImplementedError("GoCustomDecoder is decode-only; use a specific custom type encoder")
 
     def decode(self, decoder: Decoder, stream: Stream):
-        val = go_bytes_codec.decode(None, stream)
-        if val.startswith(_numpy_custom_prefix):
+        val = _decode_bytes_view(stream.msg)
+        if val[: len(_numpy_custom_prefix)] == _numpy_custom_prefix:
             val = val[len(_numpy_custom_prefix) :]
             with gzip.GzipFile(fileobj=io.BytesIO(val), mode="rb") as f:
                 return np.load(f)
         else:
-            return GoCustomValue(val)
+            return GoCustomValue(bytes(val))
+
+    def skip(self, unused_decoder: Decoder, stream: Stream):
+        _skip_bytes(stream.msg)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -349,8 +1172,8 @@ class GoCustomEncoderNumpy(GoCodec):
         file = io.BytesIO()
         with gzip.GzipFile(fileobj=file, mode="wb") as f:
             np.save(f, d)
-        buf.extend(_numpy_custom_prefix)
-        buf.extend(file.getvalue())
+        # Like encoding/gob, marshaled values are encoded as byte slices.
+        _encode_bytes(buf, _numpy_custom_prefix + file.getvalue())
 
     def decode(self, decoder: Decoder, stream: Stream):
         raise NotImplementedError("use combined GoCustomDecoder for decode")
@@ -418,6 +1241,35 @@ go_bytes_codec = GoBytesCodec()
 go_string_codec = GoStringCodec()
 go_interface_codec = GoInterfaceCodec()
 
+_numpy_slice_kinds = {
+    go_int_codec: "i",
+    go_uint_codec: "u",
+    go_float_codec: "f",
+    go_bool_codec: "b",
+}
+"_numpy_slice_kinds maps element codecs supporting vectorized coding to their NumPy dtype kind."
+
+_numpy_slice_codecs = {kind: codec for codec, kind in _numpy_slice_kinds.items()}
+
+_numpy_slice_elems = {
+    go_int_codec: _ints_from_uints,
+    go_uint_codec: lambda u: u,
+    go_float_codec: _floats_from_uints,
+    go_bool_codec: _bools_from_uints,
+}
+
+_column_dtypes = {
+    go_int_codec: np.int64,
+    go_uint_codec: np.uint64,
+    go_float_codec: np.float64,
+    go_bool_codec: np.bool_,
+    go_string_codec: object,
+    go_bytes_codec: object,
+}
+"_column_dtypes maps the field codecs GoColumns supports to their columns' dtypes."
+
+_column_zeros = {go_string_codec: "", go_bytes_codec: b""}
+
 go_custom_decoder = GoCustomDecoder()
 go_custom_encoder_numpy = GoCustomEncoderNumpy()
 
@@ -465,35 +1317,169 @@ _DEFAULT_TYPE_IDS = {
 }
 
 
+@dataclasses.dataclass(frozen=True)
+class EncodePlan:
+    codec: GoCodec
+    type_deps: typing.Tuple[int]
+    "type_deps are the wire type ids (ascending) that must be sent before values of this plan."
+    header: bytes
+    "header precedes each encoded value: its type id, and for non-structs, a zero delta."
+    encode: typing.Callable[[bytearray, typing.Any], None]
+
+
+_KIND_SCALAR = "scalar"
+_KIND_SEQUENCE = "sequence"
+_KIND_MAPPING = "mapping"
+_KIND_DATACLASS = "dataclass"
+_KIND_NUMPY = "numpy"
+_KIND_GO_SLICE = "go_slice"
+_KIND_GO_ARRAY = "go_array"
+_KIND_GO_BUFFER = "go_buffer"
+
+
 class EncodeCodecs:
     type_ids: typing.Dict[GoCodec, int]
     next_type_id: int
     wire_types: typing.Dict[int, GoWireType]
 
+    _plans: typing.Dict[typing.Hashable, EncodePlan]
+    """
+    _plans caches compiled encoders by value shape (see _shape_key), so codec discovery only runs
+    for the first value of each shape.
+    """
+
+    _kinds: typing.Dict[type, str]
+    "_kinds memoizes how values of each Python type are encoded (_KIND_*)."
+
+    _untyped_fields: typing.Dict[type, typing.Tuple[str]]
+    """
+    _untyped_fields lists, per dataclass, the fields whose codec can't be determined from the
+    field's type annotation, so their values contribute to the shape key.
+    """
+
     def __init__(self):
         self.type_ids = {**_DEFAULT_TYPE_IDS}
         self.next_type_id = 65  # It seems like encoding/gob uses this.
         self.wire_types = {}
+        self._plans = {}
+        self._kinds = {}
+        self._untyped_fields = {}
+
+    def find_plan(self, val) -> EncodePlan:
+        key = self._shape_key(val)
+        plan = self._plans.get(key)
+        if plan is None:
+            codec = self.find_codec(val)
+            type_id = self.type_ids[codec]
+            header = bytearray()
+            go_int_codec.encode(header, type_id)
+            if not isinstance(codec, GoStructCodec):
+                header.append(0)
+            plan = EncodePlan(
+                codec, self._type_deps(type_id), bytes(header), codec.compile_encode()
+            )
+            self._plans[key] = plan
+        return plan
+
+    def _shape_key(self, val) -> typing.Hashable:
+        """
+        Returns a key such that values with equal keys are encoded by the same codec. Only
+        inspects as much of val as find_codec would.
+        """
+        typ = type(val)
+        kind = self._kinds.get(typ)
+        if kind is None:
+            kind = self._kinds[typ] = _kind_for_type(typ)
+
+        if kind is _KIND_SCALAR:
+            return typ
+        if kind is _KIND_SEQUENCE:
+            if len(val) == 0:
+                raise NotImplementedError("empty sequence")
+            return (typ, self._shape_key(val[0]))
+        if kind is _KIND_MAPPING:
+            if len(val) == 0:
+                raise NotImplementedError("empty mapping")
+            k, v = next(iter(val.items()))
+            return (typ, self._shape_key(k), self._shape_key(v))
+        if kind is _KIND_DATACLASS:
+            untyped = self._untyped_fields.get(typ)
+            if untyped is None:
+                untyped = self._untyped_fields[typ] = tuple(
+                    field.name
+                    for field in dataclasses.fields(typ)
+                    if not _codec_for_type(field.type)
+                )
+            if not untyped:
+                return typ
+            return (typ,) + tuple(self._shape_key(getattr(val, name)) for name in untyped)
+        if kind is _KIND_NUMPY or kind is _KIND_GO_BUFFER:
+            return typ
+        if kind is _KIND_GO_SLICE or kind is _KIND_GO_ARRAY:
+            vals = val.vals
+            if isinstance(vals, np.ndarray):
+                elem_key = (np.ndarray, vals.dtype.kind)
+            elif len(vals) == 0:
+                raise NotImplementedError("empty sequence")
+            else:
+                elem_key = self._shape_key(vals[0])
+            return (typ, elem_key, len(vals) if kind is _KIND_GO_ARRAY else None)
+        raise NotImplementedError(val)
+
+    def _type_deps(self, type_id: int) -> typing.Tuple[int]:
+        deps = set()
+        pending = [type_id]
+        while pending:
+            type_id = pending.pop()
+            if type_id in deps or type_id not in self.wire_types:
+                continue
+            deps.add(type_id)
+            wire_type = self.wire_types[type_id]
+            if wire_type.slice_type:
+                pending.append(wire_type.slice_type.elem)
+            if wire_type.array_type:
+                pending.append(wire_type.array_type.elem)
+            if wire_type.map_type:
+                pending.extend((wire_type.map_type.key, wire_type.map_type.elem))
+            if wire_type.struct_type:
+                pending.extend(f.id for f in wire_type.struct_type.fields)
+        return tuple(sorted(deps))
 
     def find_codec(self, val):
         by_type = _codec_for_type(type(val))
         if by_type:
             return by_type
 
-        if isinstance(val, collections.abc.Sequence):
-            if len(val) == 0:
-                raise NotImplementedError("empty sequence")
-            elem_codec = self.find_codec(val[0])
-            codec = GoSliceCodec(elem_codec)
+        if isinstance(val, GoBuffer):
+            return self.find_codec(Buffer(val.Ptr, val.DType, val.Shape, val.Strides))
+
+        if isinstance(val, (GoSlice, GoArray)):
+            if isinstance(val.vals, np.ndarray):
+                if val.vals.ndim != 1:
+                    raise NotImplementedError(f"{val.vals.ndim}-D array")
+                elem_codec = _numpy_slice_codecs.get(val.vals.dtype.kind)
+                if not elem_codec:
+                    raise NotImplementedError(f"dtype {val.vals.dtype}")
+            else:
+                if len(val.vals) == 0:
+                    raise NotImplementedError("empty sequence")
+                elem_codec = self.find_codec(val.vals[0])
+            if isinstance(val, GoSlice):
+                return self._slice_codec(elem_codec)
+            codec = GoArrayCodec(elem_codec, len(val.vals))
             type_id = self._get_or_create_type_id(codec)
             if not type_id in self.wire_types:
                 self.wire_types[type_id] = GoWireType(
-                    slice_type=GoSliceType(
-                        GoCommonType(None, type_id), self.type_ids[elem_codec]
+                    array_type=GoArrayType(
+                        GoCommonType(None, type_id), self.type_ids[elem_codec], len(val.vals)
                     )
                 )
             return codec
-            # TODO: Allow encoding arrays, perhaps using a Python wrapper to mark them.
+
+        if isinstance(val, collections.abc.Sequence):
+            if len(val) == 0:
+                raise NotImplementedError("empty sequence")
+            return self._slice_codec(self.find_codec(val[0]))
 
         if isinstance(val, collections.abc.Mapping):
             if len(val) == 0:
@@ -527,7 +1513,7 @@ class EncodeCodecs:
             if not type_id in self.wire_types:
                 self.wire_types[type_id] = GoWireType(
                     struct_type=GoStructType(
-                        GoCommonType(type(val).__name__, type_id),
+                        GoCommonType(_go_type_name(type(val)), type_id),
                         tuple(
                             GoFieldType(field.name, self.type_ids[field_codec])
                             for field, field_codec in zip(fields, codec.fields)
@@ -545,6 +1531,17 @@ class EncodeCodecs:
 
         raise NotImplementedError(val)
 
+    def _slice_codec(self, elem_codec: GoCodec) -> GoCodec:
+        codec = GoSliceCodec(elem_codec)
+        type_id = self._get_or_create_type_id(codec)
+        if not type_id in self.wire_types:
+            self.wire_types[type_id] = GoWireType(
+                slice_type=GoSliceType(
+                    GoCommonType(None, type_id), self.type_ids[elem_codec]
+                )
+            )
+        return codec
+
     def _get_or_create_type_id(self, codec: GoCodec) -> int:
         if codec not in self.type_ids:
             self.type_ids[codec] = self.next_type_id
@@ -552,6 +1549,32 @@ class EncodeCodecs:
         return self.type_ids[codec]
 
 
+def _kind_for_type(typ: type) -> typing.Optional[str]:
+    "Return how find_codec handles values of type typ, in the same precedence order."
+    if _codec_for_type(typ):
+        return _KIND_SCALAR
+    if issubclass(typ, GoSlice):
+        return _KIND_GO_SLICE
+    if issubclass(typ, GoArray):
+        return _KIND_GO_ARRAY
+    if issubclass(typ, GoBuffer):
+        return _KIND_GO_BUFFER
+    if issubclass(typ, collections.abc.Sequence):
+        return _KIND_SEQUENCE
+    if issubclass(typ, collections.abc.Mapping):
+        return _KIND_MAPPING
+    if dataclasses.is_dataclass(typ):
+        return _KIND_DATACLASS
+    if issubclass(typ, np.ndarray):
+        return _KIND_NUMPY
+    return None
+
+
+def _go_type_name(typ: type) -> str:
+    "Returns the name of the Go struct type that dataclass typ mirrors (see Decoder.register)."
+    return getattr(typ, "_go_type_name", typ.__name__)
+
+
 def _codec_for_type(typ: type):
     "Return codec for typ, else None (if codec is value-dependent)."
     if type(typ) is not type:
@@ -570,6 +1593,22 @@ def _codec_for_type(typ: type):
     return None
 
 
+def _record_class(name: str, field_names: typing.Tuple[str, ...]) -> type:
+    """
+    Returns a dataclass with field_names (defaulting to None) and __slots__, so that instances
+    have no per-instance __dict__. (Like dataclass(slots=True), which needs Python 3.10.)
+    """
+    cls = dataclasses.make_dataclass(name, [(f, typing.Any, None) for f in field_names])
+    namespace = dict(cls.__dict__)
+    for f in field_names:
+        # The generated __init__ holds the defaults; class attributes would conflict with slots.
+        namespace.pop(f, None)
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    namespace["__slots__"] = field_names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
 class DecodeCodecs:
     _codecs: typing.Dict[int, typing.Union[GoCodec, typing.Callable[[], GoCodec]]]
     """
@@ -583,11 +1622,35 @@ class DecodeCodecs:
     _registered: typing.Dict[str, type]
     "_registered contains dataclass types that will be used if they match a wire type (by name)."
 
-    def __init__(self):
+    _wire_types: typing.Dict[int, GoWireType]
+    "_wire_types are those received so far, so codecs can be rebuilt when types are registered."
+
+    _structs: str
+    "_structs is Decoder's structs option, for types not in _registered."
+
+    _generated: typing.Dict[typing.Tuple[str, str, typing.Tuple[str, ...]], type]
+    """
+    _generated caches classes made for wire struct types, by (structs, name, field names), so
+    rebuilding codecs keeps decoding to the same classes.
+    """
+
+    def __init__(self, structs: str = STRUCTS_RECORD):
+        assert structs in _STRUCTS_MODES, f"unknown structs option: {structs}"
         self._codecs = {type_id: codec for codec, type_id in _DEFAULT_TYPE_IDS.items()}
         self._registered = {}
+        self._wire_types = {}
+        self._structs = structs
+        self._generated = {}
 
     def add_codec(self, type_id: int, wire_type: GoWireType):
+        # encoding/gob's type ids are process-wide, so a long-lived decoder (reading many streams
+        # from the same Go process) sees the same definitions again. Keep the existing codec.
+        if self._wire_types.get(type_id) == wire_type:
+            return
+        self._wire_types[type_id] = wire_type
+        self._set_codec(type_id, wire_type)
+
+    def _set_codec(self, type_id: int, wire_type: GoWireType):
         # We use type_id even if t.common.id is different. This happened with a GobEncoder object;
         # not sure if there are other circumstances where it can happen, too.
 
@@ -600,17 +1663,25 @@ class DecodeCodecs:
         if wire_type.struct_type:
             t = wire_type.struct_type
             # TODO: Field types?
-            if t.common.name in self._registered:
-                datacls = self._registered[t.common.name]
-                # TODO: Check compatibility with wire type.
+            registered = self._registered.get(t.common.name)
+            if registered and [f.name for f in dataclasses.fields(registered)] == [
+                f.name for f in t.fields
+            ]:
+                datacls = registered
+                # TODO: Check field types, too.
                 # TODO: Mark as "used"?
             else:
-                datacls = dataclasses.make_dataclass(
-                    t.common.name, [(f.name, typing.Any, None) for f in t.fields]
+                datacls = self._struct_class(t.common.name, tuple(f.name for f in t.fields))
+
+            def struct_codec(datacls=datacls, t=t):
+                fields = tuple(self.get_codec(f.id) for f in t.fields)
+                columnar = datacls is not registered and all(
+                    codec in _column_dtypes for codec in fields
                 )
-            self._codecs[type_id] = lambda: GoStructCodec(
-                datacls, tuple(self.get_codec(f.id) for f in t.fields),
-            )
+                column_names = tuple(f.name for f in t.fields) if columnar else None
+                return GoStructCodec(datacls, fields, column_names)
+
+            self._codecs[type_id] = struct_codec
         if wire_type.map_type:
             t = wire_type.map_type
             self._codecs[type_id] = lambda: GoMapCodec(
@@ -624,6 +1695,27 @@ class DecodeCodecs:
         if custom_type:
             self._codecs[type_id] = go_custom_decoder
 
+    def _struct_class(self, name: str, field_names: typing.Tuple[str, ...]) -> type:
+        key = (self._structs, name, field_names)
+        cls = self._generated.get(key)
+        if cls is None:
+            if self._structs == STRUCTS_TUPLE:
+                cls = tuple
+            elif self._structs == STRUCTS_NAMEDTUPLE:
+                cls = collections.namedtuple(name, field_names, defaults=(None,) * len(field_names))
+            else:
+                cls = _record_class(name, field_names)
+            self._generated[key] = cls
+        return cls
+
+    def set_structs(self, structs: str):
+        assert structs in _STRUCTS_MODES, f"unknown structs option: {structs}"
+        if structs == self._structs:
+            return
+        self._structs = structs
+        for type_id, wire_type in self._wire_types.items():
+            self._set_codec(type_id, wire_type)
+
     def get_codec(self, type_id: int) -> GoCodec:
         codec = self._codecs[type_id]
         if callable(codec):
@@ -632,10 +1724,34 @@ class DecodeCodecs:
         return codec
 
     def register(self, typ: type):
-        assert dataclasses.is_dataclass(typ), f"expected dataclass: {typ}"
-        if typ in self._registered:
-            return
-        self._registered[typ.__name__] = typ
-        for field in dataclasses.fields(typ):
-            if dataclasses.is_dataclass(field.type):
-                self.register(field.type)
+        self.set_registered((*self._registered.values(), typ))
+
+    def set_registered(self, types: typing.Iterable[type]):
+        "Replaces the registered dataclasses with types (and their dataclass fields' types)."
+        registered = {}
+
+        def add(typ):
+            assert dataclasses.is_dataclass(typ), f"expected dataclass: {typ}"
+            name = _go_type_name(typ)
+            if registered.get(name) is typ:
+                return
+            registered[name] = typ
+            for field in dataclasses.fields(typ):
+                if dataclasses.is_dataclass(field.type):
+                    add(field.type)
+
+        for typ in types:
+            add(typ)
+        changed = {
+            name
+            for name in registered.keys() | self._registered.keys()
+            if registered.get(name) is not self._registered.get(name)
+        }
+        self._registered = registered
+        if any(
+            wire_type.struct_type and wire_type.struct_type.common.name in changed
+            for wire_type in self._wire_types.values()
+        ):
+            # Codecs (including any referring to typ's codec) were built without typ; rebuild.
+            for type_id, wire_type in self._wire_types.items():
+                self._set_codec(type_id, wire_type)
@@ -0,0 +1,228 @@
+"""
+Benchmarks gobcodec's encoding and decoding, in pure Python (no Go toolchain or pygo module).
+
+    python -m python.gobcodec_bench [--filter REGEX] [--json]
+
+Each case decodes a golden stream from testdata/gobcodec, written by encoding/gob (see gen.go
+there), and encodes the decoded value. Encoders and decoders are reused across iterations, as
+in pygo's call sessions, but each value is a new stream, so type descriptors are included.
+Before timing, each case checks that its encoding decodes to the golden value.
+
+Reports time per value, throughput (of the encoded size), and the peak memory allocated while
+encoding or decoding one value (by tracemalloc). --json writes results for tracking regressions.
+"""
+
+import argparse
+import dataclasses
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import timeit
+import tracemalloc
+import typing
+
+import numpy as np
+
+from python import gobcodec
+
+_TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata", "gobcodec")
+
+
+# These match the structs in gen.go.
+
+
+@dataclasses.dataclass
+class Inner:
+    A: int = None
+    B: float = None
+
+
+@dataclasses.dataclass
+class Record:
+    Name: str = None
+    Inner: Inner = None
+    Tags: typing.List[str] = None
+    Score: float = None
+
+
+@dataclasses.dataclass(frozen=True)
+class _Case:
+    name: str
+    golden: str  # File in _TESTDATA, without .gob.
+    numpy_slices: bool = False
+    # to_encode converts the decoded golden value to the value to encode; None skips encoding.
+    to_encode: typing.Optional[typing.Callable[[typing.Any], typing.Any]] = lambda v: v
+    # known_types False decodes structs to classes generated per structs option.
+    known_types: bool = True
+    structs: str = gobcodec.STRUCTS_RECORD
+    columns: bool = False
+    lazy: bool = False
+    # read, if set, reads (part of) each decoded value, as part of decoding.
+    read: typing.Optional[typing.Callable[[typing.Any], typing.Any]] = None
+
+
+_CASES = (
+    _Case("int", "int"),
+    _Case("float", "float"),
+    _Case("string", "string"),
+    _Case("ints_1byte", "ints_1byte"),
+    _Case("ints_3byte", "ints_3byte"),
+    _Case("ints_9byte", "ints_9byte"),
+    _Case("ints_9byte/numpy", "ints_9byte", True, lambda v: gobcodec.GoSlice(v)),
+    _Case("floats", "floats"),
+    _Case("floats/numpy", "floats", True, lambda v: gobcodec.GoSlice(v)),
+    _Case("strings", "strings"),
+    _Case("bytes_256k", "bytes_256k"),
+    _Case("map_str_int", "map_str_int"),
+    _Case("records", "records"),
+    _Case("records/generated", "records", known_types=False),
+    _Case(
+        "records/namedtuple",
+        "records",
+        known_types=False,
+        structs=gobcodec.STRUCTS_NAMEDTUPLE,
+        to_encode=None,
+    ),
+    _Case(
+        "records/tuple",
+        "records",
+        known_types=False,
+        structs=gobcodec.STRUCTS_TUPLE,
+        to_encode=None,
+    ),
+    # gobcodec doesn't encode interfaces.
+    _Case("interfaces", "interfaces", to_encode=None),
+    _Case("records/lazy_first", "records", lazy=True, read=lambda v: v[0].Tags[0]),
+    _Case("records/lazy_all", "records", lazy=True, read=lambda v: [r.Tags[:] for r in v]),
+    _Case("numpy_float64s", "numpy_float64s"),
+    _Case("rows", "rows", known_types=False),
+    _Case("rows/columns", "rows", known_types=False, columns=True, to_encode=None),
+)
+
+
+@dataclasses.dataclass
+class Result:
+    case: str
+    op: str  # "encode" or "decode".
+    seconds: float  # Per value.
+    bytes: int  # Encoded size.
+    peak_alloc_bytes: int
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / self.seconds / 1e6
+
+
+def _new_decoder(case: _Case) -> gobcodec.Decoder:
+    return gobcodec.Decoder(
+        known_types=(Record, Inner) if case.known_types else (),
+        numpy_slices=case.numpy_slices,
+        structs=case.structs,
+        columns=case.columns,
+        lazy=case.lazy,
+    )
+
+
+def _equal(a, b) -> bool:
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    if isinstance(a, (list, tuple)):
+        return type(a) is type(b) and len(a) == len(b) and all(map(_equal, a, b))
+    if dataclasses.is_dataclass(a) and dataclasses.is_dataclass(b):
+        # Generated classes differ between decoders.
+        return type(a).__name__ == type(b).__name__ and _equal(
+            dataclasses.astuple(a), dataclasses.astuple(b)
+        )
+    return a == b
+
+
+def _time(op: typing.Callable[[], typing.Any], repeat: int) -> float:
+    "Returns the best seconds per call of op."
+    timer = timeit.Timer(op)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def _peak_alloc(op: typing.Callable[[], typing.Any]) -> int:
+    "Returns the peak bytes allocated (and not yet freed) during a call of op."
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - base
+
+
+def run_case(case: _Case, repeat: int) -> typing.List[Result]:
+    with open(os.path.join(_TESTDATA, case.golden + ".gob"), "rb") as f:
+        golden = f.read()
+    decoder = _new_decoder(case)
+    (value,) = decoder.decode_all(golden)
+    if case.read:
+        decode = lambda: case.read(decoder.decode_all(golden)[0])
+    else:
+        decode = lambda: decoder.decode_all(golden)
+    results = [Result(case.name, "decode", _time(decode, repeat), len(golden), _peak_alloc(decode))]
+
+    if case.to_encode is not None:
+        to_encode = case.to_encode(value)
+        encoder = gobcodec.Encoder()
+
+        def encode():
+            encoder.reset()
+            return encoder.encode(to_encode)
+
+        encoded = encode()
+        (roundtrip,) = _new_decoder(case).decode_all(encoded)
+        if not _equal(roundtrip, value):
+            raise AssertionError(f"{case.name}: encoding doesn't decode to the golden value")
+        results.append(
+            Result(case.name, "encode", _time(encode, repeat), len(encoded), _peak_alloc(encode))
+        )
+    return results
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--filter", default="", help="only run cases matching this regex")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions (best is used)")
+    parser.add_argument("--json", action="store_true", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for case in _CASES:
+        if not re.search(args.filter, case.name):
+            continue
+        for result in run_case(case, args.repeat):
+            results.append(result)
+            if not args.json:
+                print(
+                    f"{result.case:18s} {result.op:6s} {result.seconds * 1e6:12.1f} us"
+                    f" {result.mb_per_second:9.2f} MB/s {result.peak_alloc_bytes / 1024:10.1f} KiB",
+                    flush=True,
+                )
+    if args.json:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "results": [
+                    {**dataclasses.asdict(r), "mb_per_second": r.mb_per_second} for r in results
+                ],
+            },
+            sys.stdout,
+            indent=2,
+        )
+        print()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,45 @@
+import dataclasses
+import unittest
+
+import numpy as np
+
+from python import gobcodec
+
+
+def _roundtrip(*vals):
+    enc, buf = gobcodec.Encoder(), bytearray()
+    for val in vals:
+        enc.encode_into(buf, val)
+    return gobcodec.Decoder().decode_all(bytes(buf))
+
+
+class TestGobCodec(unittest.TestCase):
+    def test_ndarray(self):
+        # Arrays (other than native slices) are sent as BinaryMarshaler values, which gob frames
+        # as byte slices; values after them must still decode.
+        arrays = (
+            np.arange(5.0),
+            np.arange(6, dtype=np.float32).reshape(2, 3),
+            np.array([1, -2], dtype=np.int8),
+        )
+        for a in arrays:
+            got, after = _roundtrip(a, 7)
+            self.assertEqual(got.dtype, a.dtype)
+            self.assertTrue(np.array_equal(got, a))
+            self.assertEqual(after, 7)
+
+    def test_go_type_name(self):
+        # Dataclasses are matched with Go structs by _go_type_name, if set: gobcodec.Buffer only
+        # decodes pygo.Buffer's type (PygoBuffer), not other structs named Buffer.
+        Buffer = dataclasses.make_dataclass("Buffer", ["Ptr", "DType", "Shape", "Strides"])
+        enc, buf = gobcodec.Encoder(), bytearray()
+        enc.encode_into(buf, Buffer(2, "<f8", [1], [8]))
+        enc.encode_into(buf, gobcodec.Buffer(2, "<f8", [1], [8]))
+        user, ours = gobcodec.Decoder(known_types=(gobcodec.Buffer,)).decode_all(bytes(buf))
+        self.assertNotIsInstance(user, gobcodec.Buffer)
+        self.assertEqual(dataclasses.astuple(user), (2, "<f8", [1], [8]))
+        self.assertEqual(ours, gobcodec.Buffer(2, "<f8", [1], [8]))
+
+
+if __name__ == "__main__":
+    unittest.main()
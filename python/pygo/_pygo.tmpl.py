@@ -1,7 +1,18 @@
 import array
+import asyncio
+import collections.abc
+import concurrent.futures
 import ctypes
+import dataclasses
+import itertools
 import os
 import sys
+import threading
+import time
+import typing
+import weakref
+
+import numpy as np
 
 from python import gobcodec
 
@@ -14,11 +25,28 @@ class _PygoTuple(ctypes.Structure):
     )
 
 
+_PygoPullFn = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_ulonglong, ctypes.POINTER(_PygoTuple))
+
+
+class _PygoTiming(ctypes.Structure):
+    _fields_ = (
+        ("decode_ns", ctypes.c_longlong),
+        ("call_ns", ctypes.c_longlong),
+        ("encode_ns", ctypes.c_longlong),
+        ("copy_ns", ctypes.c_longlong),
+        ("total_ns", ctypes.c_longlong),
+    )
+
+
 class _PygoRequest(ctypes.Structure):
     _fields_ = (
         ("func_name", ctypes.c_char_p),
+        ("session", ctypes.c_ulonglong),
+        ("pull", _PygoPullFn),
         ("ins", _PygoTuple),
         ("outs", _PygoTuple),
+        ("timed", ctypes.c_int),
+        ("timing", _PygoTiming),
     )
 
 
@@ -39,39 +67,575 @@ def _find() -> str:
 _lib = ctypes.CDLL(_find())
 _lib.grail_pygo_call.argtypes = [ctypes.POINTER(_PygoRequest)]
 _lib.grail_pygo_call.restype = ctypes.c_char_p
+_lib.grail_pygo_call_many.argtypes = [ctypes.POINTER(_PygoRequest), ctypes.c_int]
+_lib.grail_pygo_call_many.restype = ctypes.c_char_p
+_lib.grail_pygo_stream_open.argtypes = [ctypes.POINTER(_PygoRequest)]
+_lib.grail_pygo_stream_open.restype = ctypes.c_char_p
+_lib.grail_pygo_stream_next.argtypes = [
+    ctypes.c_ulonglong,
+    ctypes.c_int,
+    ctypes.POINTER(_PygoRequest),
+]
+_lib.grail_pygo_stream_next.restype = ctypes.c_char_p
+_lib.grail_pygo_stream_close.argtypes = [ctypes.c_ulonglong]
+_lib.grail_pygo_handle_release.argtypes = [ctypes.c_longlong]
 _lib.grail_pygo_free.argtypes = [ctypes.POINTER(_PygoRequest)]
+_lib.grail_pygo_buffer_free.argtypes = [ctypes.c_void_p]
+_lib.grail_pygo_session_new.restype = ctypes.c_ulonglong
+_lib.grail_pygo_session_free.argtypes = [ctypes.c_ulonglong]
 
 
 class CallError(Exception):
     pass
 
 
-def call(name: str, *args, known_types=tuple()):
-    req = _PygoRequest()
-    req.func_name = name.encode("utf-8")
+@dataclasses.dataclass(eq=False)
+class Handle:
+    """
+    Handle refers to a value kept in the Go heap (a pygo.Handle returned by a Go function). Pass
+    it back as an argument instead of the value. The value is released by close() (or at the end
+    of a with block, or when the Handle is garbage collected).
+    """
 
-    req.ins.num = len(args)
-    enc = gobcodec.Encoder()
-    encoded_args = [enc.encode(a) for a in args]
-    req.ins.data_size = int(sum(len(ea) for ea in encoded_args))
-    ins_data = (ctypes.c_ubyte * req.ins.data_size)(
-        *(b for ea in encoded_args for b in ea)
-    )
-    req.ins.data = ctypes.cast(ins_data, ctypes.POINTER(ctypes.c_ubyte))
+    # pygo.Handle's defined type, so that user structs named Handle don't decode as Handles.
+    _go_type_name: typing.ClassVar[str] = "PygoHandle"
+    ID: int = 0
+
+    def __post_init__(self):
+        self._release = weakref.finalize(self, _lib.grail_pygo_handle_release, self.ID)
+        if not self.ID:
+            self._release.detach()
+
+    def close(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_exc_info):
+        self.close()
+
+
+class _CallState:
+    """
+    _CallState holds objects reused across calls. Each is used by one call at a time.
+
+    With sessions, enc and dec are the Python ends of a pair of gob streams that the Go session
+    continues across calls, so type descriptors are exchanged once per session.
+    """
+
+    def __init__(self):
+        self.req = _PygoRequest()
+        self.req.pull = _pull
+        self.enc = gobcodec.Encoder()
+        self.dec = _new_decoder()
+        self.ins = bytearray()
+        self.timed = False  # Mirrors req.timed.
+        self.session = 0
+        self._free_session = None
+
+    def use_session(self, session: bool):
+        if session and not self.session:
+            self.session = _lib.grail_pygo_session_new()
+            self._free_session = weakref.finalize(
+                self, _lib.grail_pygo_session_free, self.session
+            )
+            # Types sent by earlier, one-off calls are new to this session.
+            self.enc.reset()
+            self.dec = _new_decoder()
+        elif not session:
+            # Go decodes each call's arguments as a new gob stream, and encodes results to one.
+            self.end_session()
+        self.req.session = self.session if session else 0
+
+    def end_session(self):
+        "Discards the session, e.g. after an error leaves its streams in an unknown state."
+        if self._free_session:
+            self._free_session()
+        self.session = 0
+        self._free_session = None
+        self.enc.reset()
+        self.dec = _new_decoder()
+
+
+def _new_decoder() -> gobcodec.Decoder:
+    return gobcodec.Decoder(known_types=(gobcodec.Buffer, Handle))
+
+
+_local = threading.local()
+
+
+def _acquire_state() -> _CallState:
+    # A list per thread, rather than a single state, so reentrant calls (e.g. from a Python
+    # callback invoked by Go) don't share buffers with the outer call.
+    free = getattr(_local, "free", None)
+    if free is None:
+        free = _local.free = []
+    return free.pop() if free else _CallState()
 
-    err = _lib.grail_pygo_call(ctypes.byref(req))
-    if err:
-        _lib.grail_pygo_free(ctypes.byref(req))
-        # TODO: Free `err`.
-        raise CallError(err.decode("utf-8"))
 
-    dec = gobcodec.Decoder(known_types=known_types)
-    # TODO: Is this making extra copies?
-    outs_data = bytes(
-        ctypes.cast(req.outs.data, ctypes.POINTER(ctypes.c_ubyte))[: req.outs.data_size]
+def _release_state(state: _CallState):
+    _local.free.append(state)
+
+
+def _data_pointer(buf: bytearray):
+    "Returns a pointer to buf's contents. It's valid until buf is next resized."
+    if not buf:
+        return None
+    # The from_buffer object exports buf only until it's collected, right after addressof.
+    addr = ctypes.addressof(ctypes.c_ubyte.from_buffer(buf))
+    return ctypes.cast(addr, ctypes.POINTER(ctypes.c_ubyte))
+
+
+def call(
+    name: str,
+    *args,
+    known_types=tuple(),
+    numpy_slices=False,
+    structs=gobcodec.STRUCTS_RECORD,
+    columns=False,
+    lazy=False,
+    session=True,
+):
+    """
+    Calls the Go function registered as name.
+
+    Iterator arguments (such as generators) are passed to <-chan T or func() (T, bool)
+    parameters in batches, as Go consumes them, rather than as a whole.
+
+    known_types are dataclasses to decode Go structs (of the same name) into. If numpy_slices,
+    numeric slices are returned as ndarrays. structs selects what other Go structs decode to. If
+    columns, slices of simple structs are returned as gobcodec.GoColumns. If lazy, slices and maps
+    are returned as proxies that decode elements as they're read (see gobcodec.Decoder). If
+    session, gob type descriptors are exchanged once per thread rather than on every call.
+    """
+    outs_num, outs = _roundtrip(
+        _lib.grail_pygo_call,
+        (),
+        name,
+        args,
+        known_types,
+        numpy_slices,
+        structs,
+        columns,
+        lazy,
+        session,
     )
-    outs_num = req.outs.num
-    _lib.grail_pygo_free(ctypes.byref(req))
-    outs = dec.decode_all(outs_data)
+    outs = tuple(_wrap_out(out) for out in outs)
     assert len(outs) == outs_num
+    return _result(outs)
+
+
+def call_many(
+    name: str,
+    arg_tuples: typing.Iterable[tuple],
+    known_types=tuple(),
+    numpy_slices=False,
+    structs=gobcodec.STRUCTS_RECORD,
+    session=True,
+) -> typing.List[typing.Any]:
+    """
+    Calls the Go function registered as name once per element of arg_tuples, in a single request.
+    Go runs the calls concurrently. Returns results in order, each as call would; a call that
+    fails (panics) has a CallError in its place instead of failing the batch.
+
+    Options are as for call, except columns and lazy.
+    """
+    arg_tuples = [tuple(args) for args in arg_tuples]
+    if not arg_tuples:
+        return []
+    num_args = len(arg_tuples[0])
+    assert all(len(args) == num_args for args in arg_tuples), "argument counts differ"
+    # Go receives one list per parameter, and sends one per result.
+    columns = tuple(list(column) for column in zip(*arg_tuples))
+    outs_num, outs = _roundtrip(
+        _lib.grail_pygo_call_many,
+        (len(arg_tuples),),
+        name,
+        columns,
+        known_types,
+        numpy_slices,
+        structs,
+        False,
+        False,
+        session,
+    )
+    errs, columns = outs[0] or {}, outs[1:]
+    assert len(columns) == outs_num
+    columns = [
+        [_wrap_out(out) for out in column]
+        if len(column) and isinstance(column[0], gobcodec.Buffer)
+        else column
+        for column in columns
+    ]
+    if len(columns) == 1:
+        results = list(columns[0])
+    elif columns:
+        results = list(zip(*columns))
+    else:
+        results = [()] * len(arg_tuples)
+    for k, err in errs.items():
+        results[k] = CallError(err)
+    return results
+
+
+def call_iter(
+    name: str,
+    *args,
+    chunk_bytes=1 << 16,
+    known_types=tuple(),
+    numpy_slices=False,
+    structs=gobcodec.STRUCTS_RECORD,
+    session=True,
+) -> typing.Iterator[typing.Any]:
+    """
+    Calls the Go function registered as name, which returns a channel or an iterator function
+    (func(yield func(T) bool)), and returns an iterator over its items.
+
+    Items are transferred in chunks of about chunk_bytes as Python consumes them, so neither side
+    holds the whole result. The Go side is stopped when the iterator is closed (or collected).
+    Other options are as for call, except columns and lazy.
+    """
+    unused_outs_num, (stream_id,) = _roundtrip(
+        _lib.grail_pygo_stream_open,
+        (),
+        name,
+        args,
+        known_types,
+        numpy_slices,
+        structs,
+        False,
+        False,
+        session,
+    )
+    return _StreamIter(stream_id, chunk_bytes, known_types, numpy_slices, structs)
+
+
+class _StreamIter:
+    "_StreamIter yields items from a Go stream. Use it from one thread at a time."
+
+    def __init__(
+        self, stream_id: int, chunk_bytes: int, known_types, numpy_slices: bool, structs: str
+    ):
+        self._id = stream_id
+        self._chunk_bytes = chunk_bytes
+        self._dec = gobcodec.Decoder(
+            known_types=(gobcodec.Buffer, Handle) + tuple(known_types),
+            numpy_slices=numpy_slices,
+            structs=structs,
+        )
+        self._items = iter(())
+        self._close = weakref.finalize(self, _lib.grail_pygo_stream_close, stream_id)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._items)
+        except StopIteration:
+            pass
+        if not self._close.alive:
+            raise StopIteration
+        req = _PygoRequest()
+        err = _lib.grail_pygo_stream_next(self._id, self._chunk_bytes, ctypes.byref(req))
+        if err:
+            self.close()
+            # TODO: Free `err`.
+            raise CallError(err.decode("utf-8"))
+        data = ctypes.string_at(req.outs.data, req.outs.data_size)
+        num = req.outs.num
+        _lib.grail_pygo_free(ctypes.byref(req))
+        if num == 0:
+            self.close()
+            raise StopIteration
+        (items,) = self._dec.decode_all(data)
+        assert len(items) == num
+        if isinstance(items[0], gobcodec.Buffer):
+            items = [_wrap_out(item) for item in items]
+        self._items = iter(items)
+        return next(self._items)
+
+    def close(self):
+        "Stops the Go side. Remaining items are discarded."
+        self._close()
+        self._items = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_exc_info):
+        self.close()
+
+
+def _roundtrip(
+    entry, entry_args, name, args, known_types, numpy_slices, structs, columns, lazy, session
+):
+    "Sends args to entry (grail_pygo_call or _call_many), returning outs.num and the outs."
+    timed = _timed
+    if timed:
+        start, start_ns = time.time(), time.perf_counter_ns()
+    state = _acquire_state()
+    try:
+        state.use_session(session)
+        req, enc, dec, ins = state.req, state.enc, state.dec, state.ins
+        req.func_name = name.encode("utf-8")
+        if state.timed != timed:
+            req.timed = state.timed = timed
+
+        ins.clear()
+        feeds = []
+        try:
+            for a in args:
+                if isinstance(a, collections.abc.Iterator):
+                    feed = _Feed(a)
+                    feeds.append(feed)
+                    a = _FeedRef(feed.id)
+                enc.encode_into(ins, a)
+        except:
+            # Types may be marked as sent, but weren't.
+            state.end_session()
+            raise
+        req.ins.num = len(args)
+        req.ins.data_size = len(ins)
+        req.ins.data = _data_pointer(ins)
+
+        for feed in feeds:
+            _feeds[feed.id] = feed
+        if timed:
+            encoded_ns = time.perf_counter_ns()
+        try:
+            err = entry(ctypes.byref(req), *entry_args)
+        finally:
+            # Go doesn't pull after returning.
+            for feed in feeds:
+                del _feeds[feed.id]
+        if timed:
+            returned_ns = time.perf_counter_ns()
+        if err:
+            _lib.grail_pygo_free(ctypes.byref(req))
+            state.end_session()
+            for feed in feeds:
+                if feed.error is not None:
+                    raise feed.error
+            # TODO: Free `err`.
+            raise CallError(err.decode("utf-8"))
+
+        outs_data = ctypes.string_at(req.outs.data, req.outs.data_size)
+        outs_num = req.outs.num
+        _lib.grail_pygo_free(ctypes.byref(req))
+
+        # known_types apply to this call only, though dec lasts for the session.
+        dec.set_known_types(known_types)
+        dec.numpy_slices = numpy_slices
+        dec.set_structs(structs)
+        dec.columns = columns
+        dec.lazy = lazy
+        try:
+            outs = dec.decode_all(outs_data)
+        except:
+            state.end_session()
+            raise
+        if timed:
+            t = req.timing
+            _record_timing(
+                name,
+                start,
+                CallTiming(
+                    calls=1,
+                    encode=(encoded_ns - start_ns) / 1e9,
+                    cgo=(returned_ns - encoded_ns - t.total_ns) / 1e9,
+                    go_decode=t.decode_ns / 1e9,
+                    go_call=t.call_ns / 1e9,
+                    go_encode=t.encode_ns / 1e9,
+                    go_copy=t.copy_ns / 1e9,
+                    decode=(time.perf_counter_ns() - returned_ns) / 1e9,
+                    bytes_in=len(ins),
+                    bytes_out=len(outs_data),
+                ),
+            )
+        return outs_num, outs
+    finally:
+        _release_state(state)
+
+
+@dataclasses.dataclass
+class CallTiming:
+    """
+    CallTiming breaks down the time (in seconds) spent in calls to a function, by phase, in the
+    order they run. call_many and call_iter requests count as one call; call_iter's later chunks
+    aren't included. Calls that fail aren't included.
+    """
+
+    calls: int = 0
+    encode: float = 0.0  # Python, arguments.
+    cgo: float = 0.0  # Calling Go and returning, through ctypes and cgo.
+    go_decode: float = 0.0  # Including finding the function and session.
+    go_call: float = 0.0  # Including pulling iterator arguments from Python.
+    go_encode: float = 0.0
+    go_copy: float = 0.0  # Results, to C memory.
+    decode: float = 0.0  # Python, results, including copying them from C memory.
+    bytes_in: int = 0  # Encoded arguments.
+    bytes_out: int = 0  # Encoded results.
+
+    def add(self, other: "CallTiming"):
+        for field in dataclasses.fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+
+
+_timed = False
+_timing_lock = threading.Lock()
+_timing_stats: typing.Dict[str, CallTiming] = collections.defaultdict(CallTiming)
+_trace_hook = None
+
+
+def enable_timing(enabled=True):
+    """
+    Starts (or stops) timing the phases of calls, on both sides, for timing_stats and the trace
+    hook. Untimed calls don't read the clock.
+    """
+    global _timed
+    _timed = enabled
+
+
+def timing_stats() -> typing.Dict[str, CallTiming]:
+    "Returns the phases of timed calls so far, summed by function name."
+    with _timing_lock:
+        return {name: dataclasses.replace(t) for name, t in _timing_stats.items()}
+
+
+def reset_timing_stats():
+    with _timing_lock:
+        _timing_stats.clear()
+
+
+def set_trace_hook(hook: typing.Optional[typing.Callable[[str, float, CallTiming], None]]):
+    """
+    Sets a function called after each timed call as hook(name, start, timing), where start is the
+    call's start time (as from time.time()), for example to record tracing spans for the phases.
+    Call enable_timing, too.
+    """
+    global _trace_hook
+    _trace_hook = hook
+
+
+def _record_timing(name: str, start: float, timing: CallTiming):
+    with _timing_lock:
+        _timing_stats[name].add(timing)
+    hook = _trace_hook
+    if hook is not None:
+        hook(name, start, timing)
+
+
+@dataclasses.dataclass
+class _FeedRef:
+    "_FeedRef is sent in place of an iterator argument (see feed.go)."
+    Feed: int
+
+
+# _feeds are the iterator arguments of calls in progress, by id.
+_feeds: typing.Dict[int, "_Feed"] = {}
+_feed_ids = itertools.count(1)
+_feed_batch_len = 1024
+
+
+class _Feed:
+    """
+    _Feed is an iterator argument, for a Go parameter of type <-chan T or func() (T, bool).
+    Go pulls its items in batches, as it consumes them.
+    """
+
+    def __init__(self, items: typing.Iterator):
+        self.id = next(_feed_ids)
+        self.items = items
+        self.enc = gobcodec.Encoder()
+        self.buf = bytearray()
+        self.error = None
+
+    def pull(self, batch: _PygoTuple):
+        items = list(itertools.islice(self.items, _feed_batch_len))
+        self.buf.clear()
+        if items:
+            # Batches continue one gob stream, so type descriptors are sent once.
+            self.enc.encode_into(self.buf, items)
+        batch.num = len(items)
+        batch.data_size = len(self.buf)
+        batch.data = _data_pointer(self.buf)
+
+
+@_PygoPullFn
+def _pull(feed_id: int, batch) -> int:
+    feed = _feeds[feed_id]
+    try:
+        feed.pull(batch.contents)
+        return 0
+    except BaseException as e:
+        # call raises this, after Go returns.
+        feed.error = e
+        return 1
+
+
+def _wrap_out(out):
+    return _buffer_array(out) if isinstance(out, gobcodec.Buffer) else out
+
+
+def _result(outs: tuple):
     return outs[0] if len(outs) == 1 else outs
+
+
+_pool_lock = threading.Lock()
+_pool: concurrent.futures.ThreadPoolExecutor = None
+_max_concurrency = os.cpu_count() or 1
+
+
+def set_max_concurrency(n: int):
+    """
+    Limits the number of calls submit and call_async run at once (default: the number of CPUs).
+    Calls already submitted finish on the previous pool.
+    """
+    assert n >= 1, n
+    global _pool, _max_concurrency
+    with _pool_lock:
+        old, _pool, _max_concurrency = _pool, None, n
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def _get_pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_max_concurrency, thread_name_prefix="pygo"
+            )
+        return _pool
+
+
+def submit(name: str, *args, **kwargs) -> concurrent.futures.Future:
+    """
+    Starts call(name, *args, **kwargs) on a worker thread and returns its Future.
+
+    ctypes releases the GIL while Go runs, so calls overlap with each other and with Python.
+    Arguments are encoded on the worker thread; don't mutate them until the call completes.
+    """
+    return _get_pool().submit(call, name, *args, **kwargs)
+
+
+async def call_async(name: str, *args, **kwargs):
+    "Like call, but awaitable, so a long Go call doesn't block the event loop."
+    return await asyncio.wrap_future(submit(name, *args, **kwargs))
+
+
+def _buffer_array(buf: gobcodec.Buffer) -> np.ndarray:
+    "Wraps Go-allocated buf as an ndarray (without copying) that frees buf when collected."
+    dtype = np.dtype(buf.DType)
+    shape = tuple(int(dim) for dim in buf.Shape or ())
+    strides = tuple(int(stride) for stride in buf.Strides or ())
+    if not buf.Ptr:
+        return np.empty(shape, dtype=dtype)
+    nbytes = dtype.itemsize
+    for dim, stride in zip(shape, strides):
+        nbytes += max(dim - 1, 0) * stride
+    mem = (ctypes.c_char * nbytes).from_address(buf.Ptr)
+    weakref.finalize(mem, _lib.grail_pygo_buffer_free, buf.Ptr)
+    return np.ndarray(shape, dtype=dtype, buffer=mem, strides=strides)
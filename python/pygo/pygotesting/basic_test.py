@@ -1,4 +1,6 @@
+import asyncio
 import dataclasses
+import itertools
 import math
 import unittest
 
@@ -88,6 +90,196 @@ class TestPyGo(unittest.TestCase):
             )
             test_idx += 1
 
+    def test_numpy_slices(self):
+        got = pygobasic.call("test_gosend_26", numpy_slices=True)
+        self.assertIsInstance(got, np.ndarray)
+        self.assertEqual(got.dtype, np.int64)
+        self.assertTrue(np.array_equal(got, [7, 8, 9]))
+
+    def test_structs(self):
+        test_idx = len(_test_objs) + len(_test_objs_send_only) + len(_test_objs_gosend_numpy)
+        got = pygobasic.call(f"test_gosend_{test_idx}")
+        self.assertFalse(hasattr(got, "__dict__"))
+        self.assertEqual(dataclasses.astuple(got), (1, None, "2"))
+        got = pygobasic.call(f"test_gosend_{test_idx}", structs=gobcodec.STRUCTS_NAMEDTUPLE)
+        self.assertEqual(got._fields, ("A", "B", "C"))
+        self.assertEqual(got, (1, None, "2"))
+        got = pygobasic.call(f"test_gosend_{test_idx}", structs=gobcodec.STRUCTS_TUPLE)
+        self.assertEqual(type(got), tuple)
+        self.assertEqual(got, (1, None, "2"))
+
+    def test_known_types(self):
+        # known_types apply only to the call they're passed to, though the session continues.
+        test_idx = len(_test_objs) + len(_test_objs_send_only) + len(_test_objs_gosend_numpy)
+        test1 = dataclasses.make_dataclass("test1", ["A", "B", "C"])
+        got = pygobasic.call(f"test_gosend_{test_idx}", known_types=(test1,))
+        self.assertIsInstance(got, test1)
+        got = pygobasic.call(f"test_gosend_{test_idx}")
+        self.assertNotIsInstance(got, test1)
+        self.assertEqual(dataclasses.astuple(got), (1, None, "2"))
+
+    def test_columns(self):
+        got = pygobasic.call("test_columns", 5, columns=True)
+        self.assertIsInstance(got, gobcodec.GoColumns)
+        self.assertEqual(len(got), 5)
+        self.assertTrue(np.array_equal(got.columns["ID"], np.arange(5)))
+        self.assertTrue(np.array_equal(got.columns["Score"], np.arange(5) / 2))
+        self.assertTrue(np.array_equal(got.columns["OK"], np.arange(5) % 3 == 0))
+        self.assertTrue(np.array_equal(got.omitted["ID"], [True, False, False, False, False]))
+        self.assertEqual(pygobasic.call("test_columns", 5)[3].ID, 3)
+        # Bytes after the slice (here, non-ASCII ones) aren't read as part of it.
+        for name in ("é", "\x80", "\u07ff" * 100):
+            got = pygobasic.call("test_columns_named", 5, name, columns=True)
+            self.assertEqual(got.Name, name)
+            self.assertTrue(np.array_equal(got.Rows.columns["Score"], np.arange(5) / 2))
+
+    def test_lazy(self):
+        got = pygobasic.call("test_columns", 1000, lazy=True)
+        self.assertIsInstance(got, gobcodec.GoLazySlice)
+        self.assertEqual(len(got), 1000)
+        self.assertEqual(got[-1].ID, 999)
+        self.assertEqual([row.ID for row in got[10:13]], [10, 11, 12])
+        self.assertEqual(got, pygobasic.call("test_columns", 1000))
+        got = pygobasic.call("test_gosend_28", lazy=True)
+        self.assertIsInstance(got, gobcodec.GoLazyMap)
+        self.assertEqual(got, {"a": 1, "b": 2})
+
+    def test_gorecv_native_numpy(self):
+        pygobasic.call("test_gorecv_26", gobcodec.GoSlice(np.array([7, 8, 9])))
+        pygobasic.call("test_gorecv_array", gobcodec.GoArray([7, 8, 9]))
+        pygobasic.call("test_gorecv_array", gobcodec.GoArray(np.array([7, 8, 9], dtype=np.int32)))
+        fs = np.linspace(0, 1, 10000)
+        self.assertAlmostEqual(pygobasic.call("test_sum_float64s", gobcodec.GoSlice(fs)), fs.sum())
+        self.assertAlmostEqual(pygobasic.call("test_sum_float64s", fs.tolist()), fs.sum())
+
+    def test_buffer(self):
+        fs = np.arange(6, dtype=np.float64)
+        pygobasic.call("test_buffer_scale", gobcodec.GoBuffer(fs), 2.0)
+        self.assertTrue(np.array_equal(fs, np.arange(0, 12, 2)))
+        with self.assertRaises(pygobasic.CallError):
+            pygobasic.call("test_buffer_scale", gobcodec.GoBuffer(fs[::2]), 2.0)
+
+        got = pygobasic.call("test_buffer_arange", 2, 3)
+        self.assertTrue(np.array_equal(got, np.arange(6).reshape(2, 3)))
+
+    def test_session(self):
+        # Repeated calls reuse the type descriptors sent earlier in the session, and an error
+        # replaces the session.
+        test_idx = len(_test_objs) + len(_test_objs_send_only) + len(_test_objs_gosend_numpy)
+        for session in (True, False, True):
+            for _ in range(2):
+                pygobasic.call("test_gorecv_28", {"a": 1, "b": 2}, session=session)
+                got = pygobasic.call(f"test_gosend_{test_idx}", session=session)
+                self.assertEqual(dataclasses.asdict(got), dataclasses.asdict(_test_objs_classes[0]))
+                with self.assertRaises(pygobasic.CallError):
+                    pygobasic.call("test_gorecv_28", "a", session=session)
+
+    def test_call_many(self):
+        self.assertEqual(
+            pygobasic.call_many("strings.Contains", [("hello", "ell"), ("hello", "x")]),
+            [True, False],
+        )
+        fs = [-float(i) for i in range(1000)]
+        self.assertEqual(pygobasic.call_many("math.Abs", [(f,) for f in fs]), [-f for f in fs])
+        self.assertEqual(pygobasic.call_many("math.Abs", []), [])
+
+        # test_gorecv_26 panics unless its argument is [7, 8, 9].
+        got = pygobasic.call_many("test_gorecv_26", [([7, 8, 9],), ([1],), ([7, 8, 9],)])
+        self.assertEqual(got[0], ())
+        self.assertIsInstance(got[1], pygobasic.CallError)
+        self.assertEqual(got[2], ())
+        with self.assertRaises(pygobasic.CallError):
+            pygobasic.call_many("math.Abs", [("a",)])
+
+    def test_call_iter(self):
+        self.assertEqual(list(pygobasic.call_iter("test_stream_chan", 5)), list(range(5)))
+        self.assertEqual(sum(pygobasic.call_iter("test_stream_chan", 100000)), 4999950000)
+        self.assertEqual(
+            list(pygobasic.call_iter("test_stream_iter", 1000, chunk_bytes=100)),
+            [str(i) for i in range(1000)],
+        )
+        with pygobasic.call_iter("test_stream_iter", -1) as items:
+            self.assertEqual(next(items), "0")
+        self.assertEqual(list(items), [])
+
+        items = pygobasic.call_iter("test_stream_panic")
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(pygobasic.CallError):
+            next(items)
+        with self.assertRaises(pygobasic.CallError):
+            pygobasic.call_iter("math.Abs", 1.0)
+
+    def test_feed(self):
+        fs = (float(i) for i in range(100000))
+        self.assertEqual(pygobasic.call("test_feed_sum", fs), 4999950000.0)
+        self.assertEqual(pygobasic.call("test_feed_sum", iter([])), 0.0)
+        # Go stops pulling items once it returns.
+        words = (str(i) for i in itertools.count())
+        self.assertEqual(pygobasic.call("test_feed_first", 3, words), ["0", "1", "2"])
+        self.assertLess(int(next(words)), 10000)
+
+        def failing():
+            yield 1.0
+            raise ValueError("failing")
+
+        with self.assertRaisesRegex(ValueError, "failing"):
+            pygobasic.call("test_feed_sum", failing())
+        with self.assertRaises(pygobasic.CallError):
+            pygobasic.call("test_feed_sum", iter(["a"]))
+        with self.assertRaises(pygobasic.CallError):
+            pygobasic.call("test_feed_sum", [1.0])
+
+    def test_handle(self):
+        with pygobasic.call("test_handle_new", ["a", "b", "c"]) as index:
+            self.assertIsInstance(index, pygobasic.Handle)
+            self.assertEqual(pygobasic.call("test_handle_lookup", index, "b"), 1)
+            self.assertEqual(pygobasic.call("test_handle_lookup", index, "d"), -1)
+        with self.assertRaises(pygobasic.CallError):
+            pygobasic.call("test_handle_lookup", index, "b")
+
+    def test_user_types(self):
+        # Go structs named Handle and Buffer (but not pygo's) aren't decoded as pygo's.
+        handle, buffer = pygobasic.call("test_user_types")
+        self.assertNotIsInstance(handle, pygobasic.Handle)
+        self.assertEqual(handle.ID, 1)
+        self.assertNotIsInstance(buffer, gobcodec.Buffer)
+        self.assertEqual((buffer.Ptr, buffer.DType), (2, "<f8"))
+
+    def test_concurrent(self):
+        futures = [pygobasic.submit("math.Abs", -float(i)) for i in range(100)]
+        self.assertEqual([f.result() for f in futures], [float(i) for i in range(100)])
+        with self.assertRaises(pygobasic.CallError):
+            pygobasic.submit("test_gorecv_28", "a").result()
+
+        async def gather():
+            return await asyncio.gather(*(pygobasic.call_async("math.Abs", -2.0) for _ in range(4)))
+
+        self.assertEqual(asyncio.run(gather()), [2.0] * 4)
+
+    def test_timing(self):
+        spans = []
+        pygobasic.reset_timing_stats()
+        pygobasic.enable_timing()
+        pygobasic.set_trace_hook(lambda *span: spans.append(span))
+        try:
+            for _ in range(3):
+                pygobasic.call("test_sum_float64s", [0.5] * 1000)
+            pygobasic.call_many("math.Abs", [(-1.0,), (-2.0,)])
+        finally:
+            pygobasic.enable_timing(False)
+            pygobasic.set_trace_hook(None)
+        pygobasic.call("math.Abs", -1.0)
+
+        stats = pygobasic.timing_stats()
+        self.assertEqual(set(stats), {"test_sum_float64s", "math.Abs"})
+        self.assertEqual(stats["test_sum_float64s"].calls, 3)
+        self.assertEqual(stats["math.Abs"].calls, 1)
+        self.assertGreater(stats["test_sum_float64s"].bytes_in, 1000)
+        for timing in stats.values():
+            self.assertGreater(timing.go_decode, 0)
+            self.assertGreater(timing.decode, 0)
+        self.assertEqual([span[0] for span in spans], ["test_sum_float64s"] * 3 + ["math.Abs"])
+
     def test_float(self):
         pygobasic.call("test_gorecv_nan", math.nan)
 
@@ -0,0 +1,162 @@
+"""
+Measures end-to-end pygo call overhead: Python encoding, ctypes and cgo, Go decoding, dispatch,
+and back, for several kinds and sizes of arguments, from several threads.
+
+Reports calls per second (over all threads) and per-call latency percentiles. `go test -bench
+Call` in the pygo package measures the same calls without Python; the difference is the cost of
+the Python side.
+"""
+
+import argparse
+import dataclasses
+import json
+import platform
+import re
+import sys
+import threading
+import time
+import typing
+
+import numpy as np
+
+from python import gobcodec
+from python.pygo.pygotesting import pygobench
+
+
+@dataclasses.dataclass
+class record:
+    Name: str = None
+    ID: int = None
+    Score: float = None
+    Tags: typing.List[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class _Case:
+    name: str
+    func: str
+    # args returns the arguments for a call with payloads of size elements.
+    args: typing.Callable[[int], tuple]
+    sized: bool = True
+    numpy_slices: bool = False
+
+
+def _records(n: int) -> typing.List[record]:
+    return [record(f"name{i}", i + 1, i + 0.5, ["a", "b"]) for i in range(n)]
+
+
+_CASES = (
+    _Case("noop", "bench_noop", lambda n: (), sized=False),
+    _Case("int", "bench_int", lambda n: (12345,), sized=False),
+    _Case("string", "bench_string", lambda n: ("x" * n,)),
+    _Case("floats", "bench_floats", lambda n: ([i + 0.5 for i in range(n)],)),
+    _Case("map", "bench_map", lambda n: ({f"key{i}": i + 1 for i in range(n)},)),
+    _Case("structs", "bench_structs", lambda n: (_records(n),)),
+    # ndarrays: copied as native slices, or shared (GoBuffer in, pygo.Buffer out).
+    _Case(
+        "ndarray",
+        "bench_floats",
+        lambda n: (gobcodec.GoSlice(np.arange(n) + 0.5),),
+        numpy_slices=True,
+    ),
+    _Case("buffer_in", "bench_buffer_sum", lambda n: (gobcodec.GoBuffer(np.arange(n) + 0.5),)),
+    _Case("buffer_out", "bench_buffer_new", lambda n: (n,)),
+)
+
+
+@dataclasses.dataclass
+class Result:
+    case: str
+    size: int
+    threads: int
+    calls: int
+    calls_per_second: float
+    # Latency percentiles, in microseconds.
+    p50_us: float
+    p90_us: float
+    p99_us: float
+    max_us: float
+
+
+def run(case: _Case, size: int, threads: int, seconds: float) -> Result:
+    args = case.args(size)
+    pygobench.call(case.func, *args, numpy_slices=case.numpy_slices)  # Warm up.
+    latencies = [[] for _ in range(threads)]
+    start = threading.Barrier(threads + 1)
+
+    def worker(out: typing.List[int]):
+        start.wait()
+        deadline = time.perf_counter_ns() + int(seconds * 1e9)
+        now = time.perf_counter_ns()
+        while now < deadline:
+            pygobench.call(case.func, *args, numpy_slices=case.numpy_slices)
+            then, now = now, time.perf_counter_ns()
+            out.append(now - then)
+
+    workers = [threading.Thread(target=worker, args=(out,)) for out in latencies]
+    for w in workers:
+        w.start()
+    start.wait()
+    began = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - began
+
+    all_latencies = np.concatenate([np.array(out, dtype=np.int64) for out in latencies]) / 1e3
+    p50, p90, p99 = np.percentile(all_latencies, [50, 90, 99])
+    return Result(
+        case.name,
+        size,
+        threads,
+        len(all_latencies),
+        len(all_latencies) / elapsed,
+        p50,
+        p90,
+        p99,
+        all_latencies.max(),
+    )
+
+
+def _ints(s: str) -> typing.List[int]:
+    return [int(x) for x in s.split(",")]
+
+
+def _main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filter", default="", help="only run cases matching this regex")
+    parser.add_argument("--sizes", type=_ints, default=[1, 64, 4096], help="payload elements")
+    parser.add_argument("--threads", type=_ints, default=[1, 4], help="calling threads")
+    parser.add_argument("--seconds", type=float, default=1.0, help="per measurement")
+    parser.add_argument("--json", action="store_true", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for case in _CASES:
+        if not re.search(args.filter, case.name):
+            continue
+        for size in args.sizes if case.sized else args.sizes[:1]:
+            for threads in args.threads:
+                r = run(case, size, threads, args.seconds)
+                results.append(r)
+                if not args.json:
+                    print(
+                        f"{r.case:10s} size {r.size:6d} threads {r.threads:3d}:"
+                        f" {r.calls_per_second:10.1f} calls/s,"
+                        f" p50 {r.p50_us:9.1f} p90 {r.p90_us:9.1f} p99 {r.p99_us:9.1f}"
+                        f" max {r.max_us:9.1f} us",
+                        flush=True,
+                    )
+    if args.json:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "results": [dataclasses.asdict(r) for r in results],
+            },
+            sys.stdout,
+            indent=2,
+        )
+        print()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,58 @@
+"""
+Measures call throughput as concurrency grows, using a CPU-bound Go function.
+
+Throughput should scale with concurrency up to about the number of cores, since ctypes releases
+the GIL while Go runs.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import time
+
+from python.pygo.pygotesting import pygobasic
+
+
+def _run(calls: int, iters: int) -> float:
+    start = time.perf_counter()
+    futures = [pygobasic.submit("test_spin", iters) for _ in range(calls)]
+    concurrent.futures.wait(futures)
+    for f in futures:
+        f.result()
+    return time.perf_counter() - start
+
+
+async def _run_async(calls: int, iters: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(pygobasic.call_async("test_spin", iters) for _ in range(calls)))
+    return time.perf_counter() - start
+
+
+def _main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=256)
+    parser.add_argument("--iters", type=int, default=2_000_000, help="work per call")
+    parser.add_argument("--max_concurrency", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--asyncio", action="store_true", help="use call_async")
+    args = parser.parse_args()
+
+    pygobasic.call("test_spin", 1)  # Warm up.
+    base = None
+    n = 1
+    while True:
+        pygobasic.set_max_concurrency(n)
+        if args.asyncio:
+            elapsed = asyncio.run(_run_async(args.calls, args.iters))
+        else:
+            elapsed = _run(args.calls, args.iters)
+        rate = args.calls / elapsed
+        base = base or rate
+        print(f"concurrency {n:3d}: {rate:10.1f} calls/s ({rate / base:5.2f}x)")
+        if n >= args.max_concurrency:
+            break
+        n = min(2 * n, args.max_concurrency)
+
+
+if __name__ == "__main__":
+    _main()
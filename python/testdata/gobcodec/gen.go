@@ -0,0 +1,143 @@
+//go:build ignore
+
+// gen writes the golden gob streams that python/gobcodec_bench.py decodes. Run it from the
+// repository root:
+//
+//	go run python/testdata/gobcodec/gen.go
+//
+// Each file holds one value, encoded by a new gob.Encoder. Values are deterministic, but maps are
+// encoded in Go's random iteration order, so regenerated map files differ (and decode equally).
+// Zero values are avoided: gob omits them, and Python decodes omitted struct fields as None.
+package main
+
+import (
+	"encoding/gob"
+	"fmt"
+	"log"
+	"math/rand"
+	"os"
+	"path/filepath"
+	"sort"
+
+	"github.com/josh-newman/pygo/pygonumpy"
+)
+
+type Inner struct {
+	A int
+	B float64
+}
+
+type Record struct {
+	Name  string
+	Inner Inner
+	Tags  []string
+	Score float64
+}
+
+// Row has only fields that Python can decode as columns.
+type Row struct {
+	ID     int
+	Score  float64
+	Weight float64
+	Valid  bool
+}
+
+func main() {
+	gob.Register(Record{})
+	r := rand.New(rand.NewSource(1))
+	word := func(i int) string { return fmt.Sprintf("w%x", r.Intn(1<<(4*(1+i%6)))) }
+	signed := func(bits uint) int {
+		n := r.Int63n(1<<bits) + 1
+		if r.Intn(2) == 0 {
+			n = -n
+		}
+		return int(n)
+	}
+
+	values := map[string]interface{}{
+		"int":    123456,
+		"float":  2.718281828459045,
+		"string": "hello, world",
+	}
+	for _, c := range []struct {
+		name string
+		bits uint
+	}{{"ints_1byte", 6}, {"ints_3byte", 14}, {"ints_9byte", 62}} {
+		ints := make([]int, 10000)
+		for i := range ints {
+			ints[i] = signed(c.bits)
+		}
+		values[c.name] = ints
+	}
+	floats := make([]float64, 10000)
+	for i := range floats {
+		floats[i] = r.NormFloat64()
+	}
+	values["floats"] = floats
+	strs := make([]string, 10000)
+	for i := range strs {
+		strs[i] = word(i)
+	}
+	values["strings"] = strs
+	bytes := make([]byte, 256<<10)
+	r.Read(bytes)
+	values["bytes_256k"] = bytes
+	m := make(map[string]int, 1000)
+	for i := 0; i < 1000; i++ {
+		m[fmt.Sprintf("key%d", i)] = signed(30)
+	}
+	values["map_str_int"] = m
+	records := make([]Record, 1000)
+	for i := range records {
+		records[i] = Record{
+			Name:  word(i),
+			Inner: Inner{A: signed(20), B: r.Float64() + 1},
+			Tags:  []string{word(i), word(i + 1), word(i + 2)},
+			Score: r.NormFloat64(),
+		}
+	}
+	values["records"] = records
+	ifaces := make([]interface{}, 1000)
+	for i := range ifaces {
+		switch i % 3 {
+		case 0:
+			ifaces[i] = signed(20)
+		case 1:
+			ifaces[i] = word(i)
+		case 2:
+			ifaces[i] = records[i]
+		}
+	}
+	values["interfaces"] = ifaces
+	numpy := make(pygonumpy.Float64s, 10000)
+	for i := range numpy {
+		numpy[i] = float64(i) / 8
+	}
+	values["numpy_float64s"] = numpy
+	rows := make([]Row, 10000)
+	for i := range rows {
+		rows[i] = Row{ID: i + 1, Score: r.NormFloat64(), Weight: float64(r.Intn(100) + 1), Valid: true}
+	}
+	values["rows"] = rows
+
+	// gob assigns type ids (process-wide) in the order types are first encoded.
+	var names []string
+	for name := range values {
+		names = append(names, name)
+	}
+	sort.Strings(names)
+	dir := filepath.Join("python", "testdata", "gobcodec")
+	for _, name := range names {
+		v := values[name]
+		f, err := os.Create(filepath.Join(dir, name+".gob"))
+		if err != nil {
+			log.Fatal(err)
+		}
+		if err := gob.NewEncoder(f).Encode(v); err != nil {
+			log.Fatalf("%s: %v", name, err)
+		}
+		if err := f.Close(); err != nil {
+			log.Fatal(err)
+		}
+	}
+}
@@ -0,0 +1,46 @@
+package pygo
+
+import "C"
+
+import (
+	"bytes"
+	"encoding/gob"
+	"sync"
+)
+
+// session holds gob stream state that persists across calls, so each type descriptor crosses
+// between Python and Go once per session instead of once per call. Python keeps one session per
+// thread; mu guards against misuse.
+type session struct {
+	mu      sync.Mutex
+	ins     bytes.Buffer
+	insDec  *gob.Decoder
+	outs    bytes.Buffer
+	outsEnc *gob.Encoder
+}
+
+var sessions table
+
+func newSession() *session {
+	s := &session{}
+	// bytes.Buffer is an io.ByteReader, so the decoder reads exactly one message at a time and
+	// doesn't buffer ahead into the next call's data.
+	s.insDec = gob.NewDecoder(&s.ins)
+	s.outsEnc = gob.NewEncoder(&s.outs)
+	return s
+}
+
+// grail_pygo_session_new creates a session for use in grail_pygo_request.session.
+//
+//export grail_pygo_session_new
+func grail_pygo_session_new() C.ulonglong {
+	return C.ulonglong(sessions.add(newSession()))
+}
+
+// grail_pygo_session_free releases a session. After any call using a session returns an error,
+// the session's streams may be inconsistent, and callers should replace it.
+//
+//export grail_pygo_session_free
+func grail_pygo_session_free(id C.ulonglong) {
+	sessions.remove(uint64(id))
+}
@@ -0,0 +1,223 @@
+package pygo
+
+// #include "pygo.h"
+import "C"
+
+import (
+	"bytes"
+	"encoding/gob"
+	"fmt"
+	"reflect"
+	"runtime/debug"
+	"sync"
+)
+
+// streamBuffer is how many items a stream's producer may get ahead of Python, or a feed's
+// Python iterator ahead of Go.
+const streamBuffer = 1024
+
+// stream delivers the items of a function's channel or iterator result to Python in chunks.
+// Registered functions may return either of:
+//
+//	<-chan T (or chan T), which the function's goroutines send on and eventually close.
+//	func(yield func(T) bool), called in a new goroutine; yield returns false once Python stops.
+//
+// Memory stays bounded: items wait in the channel until Python asks for the next chunk.
+type stream struct {
+	mu    sync.Mutex
+	ch    reflect.Value // Items, closed at the end.
+	err   string        // Set (before ch is closed) if an iterator panics.
+	done  chan struct{} // Closed when Python closes the stream.
+	chunk reflect.Value // Slice of items, reused for each chunk.
+	buf   bytes.Buffer
+	enc   *gob.Encoder
+	// itemBytes estimates the encoded size of an item, from previous chunks, to size the next.
+	itemBytes int
+}
+
+var streams table
+
+// newStream returns a stream for out, or nil if out isn't a channel or iterator.
+func newStream(out reflect.Value) *stream {
+	s := &stream{done: make(chan struct{})}
+	s.enc = gob.NewEncoder(&s.buf)
+	// Calls from C run on a locked OS thread, so switching to a producer goroutine is
+	// expensive. So even channels are pumped into a buffered one, which next drains in batches.
+	switch t := out.Type(); {
+	case t.Kind() == reflect.Chan && t.ChanDir()&reflect.RecvDir != 0:
+		s.ch = reflect.MakeChan(reflect.ChanOf(reflect.BothDir, t.Elem()), streamBuffer)
+		go s.pump(out)
+	case isIterator(t):
+		s.ch = reflect.MakeChan(reflect.ChanOf(reflect.BothDir, t.In(0).In(0)), streamBuffer)
+		go s.iterate(out)
+	default:
+		return nil
+	}
+	s.chunk = reflect.MakeSlice(reflect.SliceOf(s.ch.Type().Elem()), 0, 0)
+	return s
+}
+
+func isIterator(t reflect.Type) bool {
+	if t.Kind() != reflect.Func || t.NumIn() != 1 || t.NumOut() != 0 {
+		return false
+	}
+	yield := t.In(0)
+	return yield.Kind() == reflect.Func && yield.NumIn() == 1 &&
+		yield.NumOut() == 1 && yield.Out(0).Kind() == reflect.Bool
+}
+
+func (s *stream) pump(ch reflect.Value) {
+	defer s.ch.Close()
+	closed := false
+	for {
+		item, ok := ch.Recv()
+		if !ok {
+			return
+		}
+		// After close, keep receiving (and discarding), so the producer can finish.
+		closed = closed || !s.send(item)
+	}
+}
+
+// send sends item to s.ch, returning false if the stream was closed first.
+func (s *stream) send(item reflect.Value) bool {
+	chosen, _, _ := reflect.Select([]reflect.SelectCase{
+		{Dir: reflect.SelectSend, Chan: s.ch, Send: item},
+		{Dir: reflect.SelectRecv, Chan: reflect.ValueOf(s.done)},
+	})
+	return chosen == 0
+}
+
+func (s *stream) iterate(f reflect.Value) {
+	defer s.ch.Close()
+	defer func() {
+		if recovered := recover(); recovered != nil {
+			s.err = fmt.Sprintf("pygo: panic during iteration: %v:\n%s", recovered, debug.Stack())
+		}
+	}()
+	yield := reflect.MakeFunc(f.Type().In(0), func(args []reflect.Value) []reflect.Value {
+		return []reflect.Value{reflect.ValueOf(s.send(args[0]))}
+	})
+	f.Call([]reflect.Value{yield})
+}
+
+// next encodes the next chunk of items into s.buf, as one slice, returning how many. It waits
+// for one item, then adds those that are ready, up to about maxBytes, so the first item arrives
+// quickly even when later ones are slow. It returns 0 at the end of the stream.
+func (s *stream) next(maxBytes int) (n int, errMsg string) {
+	s.buf.Reset()
+	maxItems := 64
+	if s.itemBytes > 0 {
+		maxItems = maxBytes/s.itemBytes + 1
+	}
+	chunk := s.chunk.Slice(0, 0)
+	item, ok := s.ch.Recv()
+	for ok {
+		chunk = reflect.Append(chunk, item)
+		if chunk.Len() >= maxItems {
+			break
+		}
+		item, ok = s.ch.TryRecv()
+	}
+	if chunk.Len() == 0 {
+		return 0, s.err
+	}
+	if err := s.enc.EncodeValue(chunk); err != nil {
+		return 0, fmt.Sprintf("pygo: error encoding stream items: %v", err)
+	}
+	s.itemBytes = s.buf.Len()/chunk.Len() + 1
+	// Keep the backing array, but not the items, which may be large.
+	s.chunk = chunk.Slice(0, 0)
+	for i := 0; i < chunk.Len(); i++ {
+		chunk.Index(i).SetZero()
+	}
+	return chunk.Len(), ""
+}
+
+// close stops s. Iterators' yield returns false. Channels returned by functions are drained in
+// the background, so their producers don't block forever, but they must still be closed.
+func (s *stream) close() {
+	close(s.done)
+}
+
+// grail_pygo_stream_open calls a function returning a channel or iterator (see stream) and
+// encodes a stream id as its single output, for grail_pygo_stream_next.
+//
+//export grail_pygo_stream_open
+func grail_pygo_stream_open(req *C.struct_grail_pygo_request) (err *C.char) {
+	req.outs = C.struct_grail_pygo_tuple{}
+	t := startTimer(req)
+	defer t.end()
+
+	c, errMsg := startCall(req)
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	defer c.done()
+
+	if c.funcType.NumOut() != 1 {
+		return C.CString(fmt.Sprintf("pygo: streaming needs 1 return value, got %d", c.funcType.NumOut()))
+	}
+	ins, feeds, errMsg := c.decodeIns()
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	if len(feeds) > 0 {
+		// The stream would outlive the call, and so the feeds' Python iterators.
+		feeds.stop()
+		return C.CString("pygo: streaming functions can't take iterator arguments")
+	}
+	t.lap(phaseDecode)
+	outs, errMsg := c.invoke(ins)
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	t.lap(phaseCall)
+	s := newStream(outs[0])
+	if s == nil {
+		return C.CString(fmt.Sprintf("pygo: can't stream return type %v", c.funcType.Out(0)))
+	}
+	id := streams.add(s)
+	if err := c.outsEnc.Encode(id); err != nil {
+		streams.remove(id)
+		s.close()
+		return C.CString(fmt.Sprintf("pygo: error encoding stream id: %v", err))
+	}
+	t.lap(phaseEncode)
+	c.setOuts(req, 1)
+	t.lap(phaseCopy)
+	return nil
+}
+
+// grail_pygo_stream_next sets req.outs to a slice of the next items, up to about maxBytes, from
+// stream id. req.outs.num is the number of items, 0 at the end of the stream. Each chunk
+// continues the gob stream of the previous one. req.outs must be freed with grail_pygo_free.
+//
+//export grail_pygo_stream_next
+func grail_pygo_stream_next(id C.ulonglong, maxBytes C.int, req *C.struct_grail_pygo_request) (err *C.char) {
+	req.outs = C.struct_grail_pygo_tuple{}
+
+	s, _ := streams.get(uint64(id)).(*stream)
+	if s == nil {
+		return C.CString(fmt.Sprintf("pygo: stream %d not found", id))
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	n, errMsg := s.next(int(maxBytes))
+	if errMsg != "" {
+		return C.CString(errMsg)
+	}
+	req.outs.num = C.int(n)
+	req.outs.data_size = C.size_t(s.buf.Len())
+	req.outs.data = (*C.uchar)(C.CBytes(s.buf.Bytes()))
+	return nil
+}
+
+// grail_pygo_stream_close releases stream id, stopping its iterator, if any.
+//
+//export grail_pygo_stream_close
+func grail_pygo_stream_close(id C.ulonglong) {
+	if s, _ := streams.remove(uint64(id)).(*stream); s != nil {
+		s.close()
+	}
+}
@@ -0,0 +1,38 @@
+package pygo
+
+import "sync"
+
+// table maps ids to values, so C and Python can refer to Go state (which they must not hold
+// pointers to). Ids start at 1 and aren't reused; 0 is never a valid id.
+type table struct {
+	mu     sync.Mutex
+	lastID uint64
+	values map[uint64]interface{}
+}
+
+func (t *table) add(v interface{}) uint64 {
+	t.mu.Lock()
+	defer t.mu.Unlock()
+	if t.values == nil {
+		t.values = map[uint64]interface{}{}
+	}
+	t.lastID++
+	t.values[t.lastID] = v
+	return t.lastID
+}
+
+// get returns the value for id, or nil if there is none.
+func (t *table) get(id uint64) interface{} {
+	t.mu.Lock()
+	defer t.mu.Unlock()
+	return t.values[id]
+}
+
+// remove deletes id, returning its value, or nil if there was none.
+func (t *table) remove(id uint64) interface{} {
+	t.mu.Lock()
+	defer t.mu.Unlock()
+	v := t.values[id]
+	delete(t.values, id)
+	return v
+}
@@ -0,0 +1,58 @@
+package pygo
+
+// #include "pygo.h"
+import "C"
+
+import "time"
+
+// timer records the phases of a request in req.timing, if req.timed. Otherwise its methods do
+// nothing, so requests that aren't timed don't read the clock.
+type timer struct {
+	timing      *C.struct_grail_pygo_timing
+	start, last time.Time
+}
+
+type phase int
+
+const (
+	phaseDecode phase = iota
+	phaseCall
+	phaseEncode
+	phaseCopy
+)
+
+func startTimer(req *C.struct_grail_pygo_request) timer {
+	if req.timed == 0 {
+		return timer{}
+	}
+	req.timing = C.struct_grail_pygo_timing{}
+	now := time.Now()
+	return timer{&req.timing, now, now}
+}
+
+// lap adds the time since the previous lap (or the start) to p.
+func (t *timer) lap(p phase) {
+	if t.timing == nil {
+		return
+	}
+	now := time.Now()
+	d := C.longlong(now.Sub(t.last))
+	t.last = now
+	switch p {
+	case phaseDecode:
+		t.timing.decode_ns += d
+	case phaseCall:
+		t.timing.call_ns += d
+	case phaseEncode:
+		t.timing.encode_ns += d
+	case phaseCopy:
+		t.timing.copy_ns += d
+	}
+}
+
+func (t *timer) end() {
+	if t.timing == nil {
+		return
+	}
+	t.timing.total_ns = C.longlong(time.Since(t.start))
+}